@@ -16,7 +16,7 @@ mkdir -p $results
 
 if [ ! -f $heinz_directory/heinz ]
 then
-    echo "\""$heinz"/heinz\" does not exist; install to use NetMix."
+    echo "\""$heinz"/heinz\" does not exist; using the MWCS solver in NetMix."
 fi
 
 ################################################################################
@@ -80,10 +80,17 @@ then
         -t 1800 \
         -v 0 \
         > /dev/null 2>&1
-fi
 
-python $scripts/process_heinz_output.py \
-    -i $results/asd_constrained_output.tsv \
-    -o $results/asd_constrained_results.txt
+    python $scripts/process_heinz_output.py \
+        -i $results/asd_constrained_output.tsv \
+        -o $results/asd_constrained_results.txt
 
-rm -f $results/asd_constrained_output.tsv
+    rm -f $results/asd_constrained_output.tsv
+else
+    python $scripts/compute_mwcs_subset.py \
+        -i $data/responsibility_scores.tsv \
+        -elf $data/network.tsv \
+        -nc 4 \
+        -t 1800 \
+        -o $results/asd_constrained_results.txt
+fi
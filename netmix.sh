@@ -28,16 +28,12 @@ netmix_directory=src
 heinz_directory=""
 tmp_directory=tmp
 
-if [ $heinz_directory=="" ]
+# Use heinz if it is installed; otherwise, use the MWCS solver in NetMix.
+if [ -n "$heinz_directory" ] && [ -f $heinz_directory/heinz ]
 then
-    echo "Error: heinz directory not provided; install heinz and set the heinz directory in this file to use NetMix."
-    exit
-fi
-
-if [ ! -f $heinz_directory/heinz ]
-then
-    echo "Error: \""$heinz"/heinz\" does not exist; install heinz and set the heinz directory in this file to use NetMix."
-    exit
+    use_heinz=true
+else
+    use_heinz=false
 fi
 
 mkdir -p $tmp_directory
@@ -56,20 +52,41 @@ python $netmix_directory/compute_scores.py \
     -i $scores \
     -o $tmp_directory/responsibility_scores.tsv
 
-# Run heinz on responsibility scores.
-$heinz_directory/./heinz \
-    -e $network \
-    -n $tmp_directory/responsibility_scores.tsv \
-    -o $tmp_directory/heinz_output.tsv \
-    -m $num_cores \
-    -t $max_num_scores \
-    -v 0 \
-    > /dev/null 2>&1
+if [ $use_heinz = true ]
+then
+    # Reduce the instance before running heinz.
+    python $netmix_directory/reduce_mwcs_instance.py \
+        -i $tmp_directory/responsibility_scores.tsv \
+        -elf $network \
+        -o $tmp_directory/reduced_responsibility_scores.tsv \
+        -oelf $tmp_directory/reduced_network.tsv \
+        -mf $tmp_directory/reduced_node_mapping.tsv
+
+    # Run heinz on responsibility scores.
+    $heinz_directory/./heinz \
+        -e $tmp_directory/reduced_network.tsv \
+        -n $tmp_directory/reduced_responsibility_scores.tsv \
+        -o $tmp_directory/heinz_output.tsv \
+        -m $num_cores \
+        -t $max_num_seconds \
+        -v 0 \
+        > /dev/null 2>&1
 
-# Parse heinz output.
-python $netmix_directory/process_heinz_output.py \
-    -i $tmp_directory/heinz_output.tsv \
-    -o $output
+    # Parse heinz output and expand the reduced nodes.
+    python $netmix_directory/process_heinz_output.py \
+        -i $tmp_directory/heinz_output.tsv \
+        -mf $tmp_directory/reduced_node_mapping.tsv \
+        -o $output
+else
+    # Run MWCS solver on responsibility scores.
+    python $netmix_directory/compute_mwcs_subset.py \
+        -i $tmp_directory/responsibility_scores.tsv \
+        -elf $network \
+        -nc $num_cores \
+        -t $max_num_seconds \
+        -o $output
+fi
 
 # Remote temporary files.
-rm -f $tmp_directory/responsibility_scores.tsv $tmp_directory/heinz_output.tsv
+rm -f $tmp_directory/responsibility_scores.tsv $tmp_directory/heinz_output.tsv \
+    $tmp_directory/reduced_responsibility_scores.tsv $tmp_directory/reduced_network.tsv $tmp_directory/reduced_node_mapping.tsv
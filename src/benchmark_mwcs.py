@@ -0,0 +1,71 @@
+#!/usr/bin/python
+
+# Load packages.
+import numpy as np
+import os, sys, argparse, time
+
+from common import em, load_node_score_arrays
+from compute_scores import transform_scores, compute_scores
+from graph import load_graph_file, degrees
+from mwcs import mwcs, positive_clusters
+from telemetry import start_trace
+
+# Parse arguments.
+def get_parser():
+    data_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'examples', 'somatic-mutations-cancer')
+
+    parser = argparse.ArgumentParser(description='Benchmark the MWCS solver on the example networks.')
+    parser.add_argument('-i', '--input_file', type=str, default=os.path.join(data_directory, 'PANCAN.tsv'), help='Input p-value file')
+    parser.add_argument('-elf', '--edge_list_files', type=str, nargs='*', default=[os.path.join(data_directory, 'hint+hi-iii.tsv'), os.path.join(data_directory, 'reactomefi2016.tsv')], help='Edge list files')
+    parser.add_argument('-nc', '--num_cores', type=int, default=1, help='Number of cores')
+    parser.add_argument('-t', '--time_limits', type=float, nargs='*', default=[10, 60], help='Time limits in seconds')
+    parser.add_argument('-ni', '--max_num_iter', type=int, default=100, help='Maximum number of local search iterations per start')
+    parser.add_argument('-o', '--output_file', type=str, required=False, help='Output file; defaults to standard output')
+    parser.add_argument('--profile', type=str, required=False, help='Append telemetry to this JSON-lines trace file')
+    return parser
+
+# Run script.
+def run(args):
+    start_trace(args.profile)
+
+    # Compute responsibility scores.
+    nodes, p_values = load_node_score_arrays(args.input_file)
+    z_scores = transform_scores(p_values)
+    mu, alpha = em(z_scores)
+    scores = compute_scores(z_scores, mu, alpha)
+
+    header = ['network', 'num_nodes', 'num_edges', 'method', 'time_limit', 'time', 'size', 'weight', 'upper_bound', 'positive_subset_weight']
+    rows = list()
+
+    for edge_list_file in args.edge_list_files:
+        network = os.path.basename(edge_list_file)
+        _, A = load_graph_file(edge_list_file, nodes)
+        in_network = degrees(A)>0
+        num_nodes = int(np.sum(in_network))
+        num_edges = A.nnz//2
+
+        # Compare with the sum of the positive scores in the network, which
+        # bounds the weight of any connected subgraph, and with the weight of
+        # the positive subset, i.e., the nonsingleton clusters of positive nodes.
+        labels = positive_clusters(A, scores)
+        cluster_sizes = np.bincount(labels[labels>=0])
+        upper_bound = float(np.sum(scores[(labels>=0) & in_network]))
+        positive_subset_weight = float(np.sum(scores[(labels>=0) & (cluster_sizes[np.maximum(labels, 0)]>1)]))
+
+        for time_limit in args.time_limits:
+            start = time.time()
+            in_subgraph = mwcs(scores, A, args.num_cores, time_limit, args.max_num_iter)
+            elapsed = time.time()-start
+
+            weight = np.sum(scores[in_subgraph])
+            rows.append([network, num_nodes, num_edges, 'mwcs', time_limit, '{:.3f}'.format(elapsed), np.sum(in_subgraph), '{:.6f}'.format(weight), '{:.6f}'.format(upper_bound), '{:.6f}'.format(positive_subset_weight)])
+
+    output_string = '\n'.join('\t'.join(map(str, row)) for row in [header]+rows)
+    if args.output_file is None:
+        print(output_string)
+    else:
+        with open(args.output_file, 'w') as f:
+            f.write(output_string)
+
+if __name__=='__main__':
+    run(get_parser().parse_args(sys.argv[1:]))
@@ -0,0 +1,193 @@
+#!/usr/bin/python
+
+# Load packages.
+import numpy as np
+import os, sys, argparse, shutil, tempfile, time, tracemalloc
+
+from common import em, load_node_score_arrays, save_node_score, save_edge_list
+from compute_scores import transform_scores, compute_scores
+from compute_positive_subset import compute_positive_subset
+from compute_scan_statistic_subset import connected_scan_statistic
+from generate_barabasi_albert_graph import barabasi_albert_graph
+from graph import load_graph_file
+from telemetry import start_trace
+
+# Parse arguments.
+def get_parser():
+    data_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'examples', 'somatic-mutations-cancer')
+
+    parser = argparse.ArgumentParser(description='Benchmark each stage of NetMix on the example data and on scaled-up synthetic data.')
+    parser.add_argument('-i', '--input_file', type=str, default=os.path.join(data_directory, 'PANCAN.tsv'), help='Input p-value file')
+    parser.add_argument('-elf', '--edge_list_files', type=str, nargs='*', default=[os.path.join(data_directory, 'hint+hi-iii.tsv'), os.path.join(data_directory, 'reactomefi2016.tsv')], help='Edge list files')
+    parser.add_argument('-sf', '--scale_factors', type=int, nargs='*', default=[1], help='Numbers of nodes relative to the example data, e.g., 1 10 100; larger factors use synthetic data')
+    parser.add_argument('-st', '--stages', type=str, nargs='*', choices=['load_scores', 'em', 'compute_scores', 'load_network', 'positive_subset', 'scan_statistic_subset'], required=False, help='Stages to benchmark; defaults to all stages')
+    parser.add_argument('-r', '--num_repeats', type=int, default=3, help='Number of timed runs of each stage; the minimum time is reported')
+    parser.add_argument('-ns', '--num_seeds', type=int, default=100, help='Number of seed nodes for the scan statistic')
+    parser.add_argument('-s', '--seed', type=int, default=0, help='Random seed for synthetic data')
+    parser.add_argument('-c', '--use_cache', action='store_true', help='Load files through the cache instead of parsing them each time')
+    parser.add_argument('-b', '--baseline_file', type=str, required=False, help='Results file of a previous run to compare against')
+    parser.add_argument('-rt', '--regression_threshold', type=float, default=0.25, help='Relative increase in time or memory over the baseline that counts as a regression')
+    parser.add_argument('-mtd', '--min_time_difference', type=float, default=0.01, help='Minimum increase in seconds over the baseline time that counts as a regression')
+    parser.add_argument('-o', '--output_file', type=str, required=False, help='Output file; defaults to standard output')
+    parser.add_argument('--profile', type=str, required=False, help='Append telemetry to this JSON-lines trace file')
+    return parser
+
+# Define functions.
+key_columns = ['scale_factor', 'network', 'stage']
+measurement_columns = ['time', 'peak_memory']
+
+def measure(function, num_repeats=3):
+    '''
+    Run a function num_repeats times and once more while tracing memory
+    allocations.  Return its result, the minimum time in seconds, and the peak
+    memory in bytes that it allocated.
+    '''
+    times = list()
+    for _ in range(num_repeats):
+        start = time.time()
+        result = function()
+        times.append(time.time()-start)
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return result, min(times), peak_memory
+
+def make_synthetic_data(directory, nodes, p_values, edge_list_files, scale_factor, seed=0):
+    '''
+    Write synthetic data with scale_factor times the nodes of the example
+    data: p-values resampled from the example p-values and, for each network,
+    a Barabasi-Albert graph with the same average degree.  Nodes are named by
+    integers.  Return the score file and the edge list files.
+    '''
+    random_state = np.random.RandomState([seed, scale_factor])
+
+    score_file = os.path.join(directory, 'scores_{}x.tsv'.format(scale_factor))
+    num_nodes = scale_factor*len(nodes)
+    synthetic_p_values = random_state.choice(np.asarray(p_values), num_nodes)
+    save_node_score(score_file, dict(zip(map(str, range(1, num_nodes+1)), synthetic_p_values)))
+
+    synthetic_edge_list_files = list()
+    for edge_list_file in edge_list_files:
+        network_nodes, A = load_graph_file(edge_list_file)
+        n = scale_factor*len(network_nodes)
+        m = max(1, int(round(0.5*A.nnz/len(network_nodes))))
+
+        synthetic_edge_list_file = os.path.join(directory, '{}_{}x.tsv'.format(os.path.splitext(os.path.basename(edge_list_file))[0], scale_factor))
+        save_edge_list(synthetic_edge_list_file, barabasi_albert_graph(n, m, random_state.randint(2**31))+1)
+        synthetic_edge_list_files.append(synthetic_edge_list_file)
+
+    return score_file, synthetic_edge_list_files
+
+def benchmark_stages(score_file, edge_list_files, stages, num_repeats=3, num_seeds=100):
+    '''
+    Benchmark each stage on a score file and edge list files.  Return a list of
+    rows with the network, stage, time, and peak memory; the network is empty
+    for stages that do not use a network.
+    '''
+    rows = list()
+    def run_stage(network, stage, function):
+        if stage not in stages:
+            return function()
+        result, elapsed, peak_memory = measure(function, num_repeats)
+        rows.append([network, stage, elapsed, peak_memory])
+        return result
+
+    # Later stages need the results of earlier stages, so every stage that they
+    # need runs, but only the chosen stages are measured.
+    nodes, p_values = run_stage('', 'load_scores', lambda: load_node_score_arrays(score_file))
+    z_scores = transform_scores(p_values)
+
+    if set(stages) & set(['em', 'compute_scores', 'positive_subset']):
+        mu, alpha = run_stage('', 'em', lambda: em(z_scores))
+        scores = run_stage('', 'compute_scores', lambda: compute_scores(z_scores, mu, alpha))
+
+    if set(stages) & set(['load_network', 'positive_subset', 'scan_statistic_subset']):
+        for edge_list_file in edge_list_files:
+            network = os.path.basename(edge_list_file)
+            _, A = run_stage(network, 'load_network', lambda: load_graph_file(edge_list_file, nodes))
+            if 'positive_subset' in stages:
+                run_stage(network, 'positive_subset', lambda: compute_positive_subset(scores, A))
+            if 'scan_statistic_subset' in stages:
+                run_stage(network, 'scan_statistic_subset', lambda: connected_scan_statistic(z_scores, A, num_seeds=num_seeds))
+
+    return rows
+
+def load_results(filename):
+    '''
+    Load a results file as a dictionary from the key columns to the measurement
+    columns.
+    '''
+    with open(filename, 'r') as f:
+        lines = f.read().splitlines()
+
+    header = lines[0].split('\t')
+    results = dict()
+    for line in lines[1:]:
+        row = dict(zip(header, line.split('\t')))
+        results[tuple(row[column] for column in key_columns)] = tuple(float(row[column]) for column in measurement_columns)
+    return results
+
+# Run script.
+def run(args):
+    start_trace(args.profile)
+
+    if not args.use_cache:
+        os.environ['NETMIX_CACHE_DIR'] = ''
+
+    stages = args.stages or ['load_scores', 'em', 'compute_scores', 'load_network', 'positive_subset', 'scan_statistic_subset']
+    baseline = load_results(args.baseline_file) if args.baseline_file else dict()
+
+    # Benchmark each scale factor.
+    rows = list()
+    directory = tempfile.mkdtemp(prefix='netmix-benchmark-')
+    try:
+        for scale_factor in args.scale_factors:
+            if scale_factor==1:
+                score_file, edge_list_files = args.input_file, args.edge_list_files
+            else:
+                nodes, p_values = load_node_score_arrays(args.input_file)
+                score_file, edge_list_files = make_synthetic_data(directory, nodes, p_values, args.edge_list_files, scale_factor, args.seed)
+
+            for network, stage, elapsed, peak_memory in benchmark_stages(score_file, edge_list_files, stages, args.num_repeats, args.num_seeds):
+                if scale_factor!=1:
+                    network = network.replace('_{}x'.format(scale_factor), '')
+                rows.append([str(scale_factor), network, stage, '{:.4f}'.format(elapsed), str(peak_memory)])
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    # Compare with baseline.
+    header = key_columns+measurement_columns
+    num_regressions = 0
+    if baseline:
+        header += ['baseline_time', 'baseline_peak_memory', 'time_ratio', 'peak_memory_ratio', 'regression']
+        for row in rows:
+            key = tuple(row[:len(key_columns)])
+            if key in baseline:
+                elapsed, peak_memory = map(float, row[len(key_columns):])
+                baseline_elapsed, baseline_peak_memory = baseline[key]
+                ratios = [value/reference if reference>0 else float('nan') for value, reference in [(elapsed, baseline_elapsed), (peak_memory, baseline_peak_memory)]]
+                is_regression = (elapsed-baseline_elapsed>max(args.regression_threshold*baseline_elapsed, args.min_time_difference)
+                    or peak_memory-baseline_peak_memory>args.regression_threshold*baseline_peak_memory)
+                num_regressions += is_regression
+                row += ['{:.4f}'.format(baseline_elapsed), str(int(baseline_peak_memory))]+['{:.3f}'.format(ratio) for ratio in ratios]+[str(is_regression)]
+            else:
+                row += ['nan', 'nan', 'nan', 'nan', 'False']
+
+    output_string = '\n'.join('\t'.join(row) for row in [header]+rows)
+    if args.output_file is None:
+        print(output_string)
+    else:
+        with open(args.output_file, 'w') as f:
+            f.write(output_string)
+
+    if num_regressions:
+        sys.stderr.write('{} stage(s) regressed by more than {:.0%} relative to {}.\n'.format(num_regressions, args.regression_threshold, args.baseline_file))
+        sys.exit(1)
+
+if __name__=='__main__':
+    run(get_parser().parse_args(sys.argv[1:]))
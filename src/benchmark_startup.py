@@ -0,0 +1,57 @@
+#!/usr/bin/python
+
+# Load packages.
+import os, sys, argparse, subprocess, time
+
+from netmix import startup_budgets
+
+# Parse arguments.
+def get_parser():
+    parser = argparse.ArgumentParser(description='Benchmark the startup time of each netmix subcommand against its budget.')
+    parser.add_argument('-sc', '--subcommands', type=str, nargs='*', choices=sorted(startup_budgets), required=False, help='Subcommands to benchmark; defaults to all subcommands')
+    parser.add_argument('-r', '--num_repeats', type=int, default=5, help='Number of timed runs of each subcommand; the minimum time is reported')
+    parser.add_argument('-bs', '--budget_scale', type=float, default=1.0, help='Multiply each budget by this factor, e.g., for slower machines')
+    parser.add_argument('-o', '--output_file', type=str, required=False, help='Output file; defaults to standard output')
+    return parser
+
+# Define functions.
+def startup_time(subcommand, num_repeats=5):
+    '''
+    Return the minimum number of seconds to start Python, import the script of
+    a subcommand, and parse its arguments, i.e., to run netmix SUBCOMMAND -h.
+    '''
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'netmix.py')
+    command = [sys.executable, script]+subcommand.split()+['-h']
+    times = list()
+    with open(os.devnull, 'w') as devnull:
+        for _ in range(num_repeats):
+            start = time.time()
+            subprocess.check_call(command, stdout=devnull)
+            times.append(time.time()-start)
+    return min(times)
+
+# Run script.
+def run(args):
+    subcommands = args.subcommands or sorted(startup_budgets)
+
+    rows = list()
+    num_over_budget = 0
+    for subcommand in subcommands:
+        elapsed = startup_time(subcommand, args.num_repeats)
+        budget = args.budget_scale*startup_budgets[subcommand]
+        num_over_budget += elapsed>budget
+        rows.append([subcommand, '{:.4f}'.format(elapsed), '{:.4f}'.format(budget), str(elapsed<=budget)])
+
+    output_string = '\n'.join('\t'.join(row) for row in [['subcommand', 'time', 'budget', 'within_budget']]+rows)
+    if args.output_file is None:
+        print(output_string)
+    else:
+        with open(args.output_file, 'w') as f:
+            f.write(output_string)
+
+    if num_over_budget:
+        sys.stderr.write('{} subcommand(s) took longer to start than their budgets.\n'.format(num_over_budget))
+        sys.exit(1)
+
+if __name__=='__main__':
+    run(get_parser().parse_args(sys.argv[1:]))
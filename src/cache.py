@@ -0,0 +1,169 @@
+#!/usr/bin/python
+
+import numpy as np
+import os, hashlib, shutil, tempfile
+
+################################################################################
+#
+# Cache functions
+#
+################################################################################
+
+# Parsed input files are cached as directories of .npy files, which are loaded
+# as read-only memory maps.  Set NETMIX_CACHE_DIR to choose the cache directory
+# or to the empty string to disable the cache, and set NETMIX_CACHE_SIZE to
+# bound the total size of the cache in bytes.
+default_cache_directory = os.path.join(os.path.expanduser('~'), '.cache', 'netmix')
+default_cache_size = 2**30
+
+def cache_directory():
+    return os.environ.get('NETMIX_CACHE_DIR', default_cache_directory)
+
+def cache_size():
+    return int(os.environ.get('NETMIX_CACHE_SIZE', default_cache_size))
+
+def file_key(filename, kind):
+    '''
+    Compute the cache key of a file from its kind, contents, and modification
+    time.
+    '''
+    h = hashlib.sha1()
+    h.update(kind.encode('utf-8'))
+    h.update(str(os.stat(filename).st_mtime).encode('utf-8'))
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(2**20), b''):
+            h.update(block)
+    return '{}-{}'.format(kind, h.hexdigest())
+
+def array_key(kind, arrays):
+    '''
+    Compute the cache key of a sequence of arrays from its kind and the dtypes,
+    shapes, and contents of the arrays.
+    '''
+    h = hashlib.sha1()
+    h.update(kind.encode('utf-8'))
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        h.update('{}{}'.format(array.dtype.str, array.shape).encode('utf-8'))
+        h.update(array.data if array.size else b'')
+    return '{}-{}'.format(kind, h.hexdigest())
+
+def file_digest(filename):
+    h = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(2**20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def content_key(kind, filenames, parameters=(), digests=None):
+    '''
+    Compute the cache key of a computation, e.g., a solver run, from its kind,
+    the contents of its input files, and its parameters, so that the key does
+    not depend on the names or modification times of the files.  The digests
+    of the files are memoized in the dictionary digests, if given.
+    '''
+    digests = dict() if digests is None else digests
+    h = hashlib.sha1()
+    h.update(kind.encode('utf-8'))
+    for filename in filenames:
+        if filename not in digests:
+            digests[filename] = file_digest(filename)
+        h.update(digests[filename].encode('utf-8'))
+    h.update(repr(tuple(parameters)).encode('utf-8'))
+    return '{}-{}'.format(kind, h.hexdigest())
+
+def entry_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+def list_entries(directory, kind=None):
+    '''
+    Return the last access time, size, and path of each cache entry, or of each
+    entry of the given kind.
+    '''
+    entries = list()
+    if not os.path.isdir(directory):
+        return entries
+
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if os.path.isdir(path) and not name.startswith('.') and (kind is None or name.startswith(kind+'-')):
+            try:
+                entries.append((os.path.getmtime(path), entry_size(path), path))
+            except OSError:
+                pass
+    return entries
+
+def evict(directory, max_size, kind=None, max_num_entries=None):
+    '''
+    Remove the least recently used cache entries, or entries of the given kind,
+    until they take at most max_size bytes and number at most max_num_entries.
+    '''
+    entries = list_entries(directory, kind)
+
+    total_size = sum(size for _, size, _ in entries)
+    num_entries = len(entries)
+    for _, size, path in sorted(entries):
+        if total_size<=max_size and (max_num_entries is None or num_entries<=max_num_entries):
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total_size -= size
+        num_entries -= 1
+
+def load_entry(path, touch=True):
+    '''
+    Load the arrays of a cache entry as read-only memory maps and, if touch is
+    True, mark the entry as used.  Return None if the entry cannot be loaded.
+    '''
+    if not os.path.isdir(path):
+        return None
+
+    try:
+        arrays = dict((name[:-4], np.load(os.path.join(path, name), mmap_mode='r')) for name in os.listdir(path) if name.endswith('.npy'))
+        if touch:
+            os.utime(path, None)
+        return arrays
+    except (IOError, OSError, ValueError):
+        return None
+
+def save_entry(directory, key, arrays):
+    '''
+    Save a dictionary of arrays as the cache entry key and evict entries if the
+    cache is full.  Errors are ignored, since the cache is only an optimization.
+    '''
+    # Write the entry to a temporary directory and rename it, so that processes
+    # never see a partial entry.
+    path = os.path.join(directory, key)
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        temporary_path = tempfile.mkdtemp(prefix='.', dir=directory)
+        for name, array in arrays.items():
+            np.save(os.path.join(temporary_path, name+'.npy'), np.asarray(array))
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        try:
+            os.rename(temporary_path, path)
+        except OSError:
+            shutil.rmtree(temporary_path, ignore_errors=True)
+        evict(directory, cache_size())
+    except (IOError, OSError):
+        pass
+
+def load_cached_arrays(filename, kind, parse):
+    '''
+    Load the arrays parsed from a file from the cache; otherwise, parse the file
+    with parse, which returns a dictionary of arrays, and cache the arrays.
+    Standard input, i.e., the filename -, is not cached.
+    '''
+    directory = cache_directory()
+    if not directory or filename=='-':
+        return parse(filename)
+
+    key = file_key(filename, kind)
+    arrays = load_entry(os.path.join(directory, key))
+    if arrays is not None:
+        return arrays
+
+    arrays = parse(filename)
+    save_entry(directory, key, arrays)
+    return arrays
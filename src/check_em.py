@@ -0,0 +1,71 @@
+#!/usr/bin/python
+
+# Load packages.
+import os, sys, argparse, shutil, tempfile
+import numpy as np
+
+from common import cached_em, load_node_score_arrays, isf
+
+# Parse arguments.
+def get_parser():
+    parser = argparse.ArgumentParser(description='Check that a warm-started EM refit on nearly identical scores takes far fewer iterations than a cold fit.')
+    parser.add_argument('-i', '--input_file', type=str, required=False, help='Gene-to-score file of p-values; defaults to simulated scores')
+    parser.add_argument('-n', '--num_scores', type=int, default=20000, help='Number of simulated scores')
+    parser.add_argument('-mu', type=float, default=2.5, help='Mean of the altered scores of the simulated scores')
+    parser.add_argument('-alpha', type=float, default=0.05, help='Fraction of altered scores of the simulated scores')
+    parser.add_argument('-nc', '--num_changes', type=int, default=10, help='Number of scores that change between the fits')
+    parser.add_argument('-r', '--ratio', type=float, default=10.0, help='Minimum ratio of the iterations of a cold fit, over all starts, to the iterations of the warm fit')
+    parser.add_argument('-s', '--seed', type=int, default=0, help='Random seed')
+    return parser
+
+# Define functions.
+def simulated_scores(n, mu, alpha, random_state):
+    x = random_state.standard_normal(n)
+    x[:int(round(alpha*n))] += mu
+    return x
+
+# Run script.
+def run(args):
+    random_state = np.random.RandomState(args.seed)
+    if args.input_file is not None:
+        _, scores = load_node_score_arrays(args.input_file)
+        x = isf(np.clip(scores, 2.2e-308, 1-2.2e-16))
+    else:
+        x = simulated_scores(args.num_scores, args.mu, args.alpha, random_state)
+
+    y = np.array(x)
+    changes = random_state.choice(np.size(y), args.num_changes, replace=False)
+    y[changes] = random_state.standard_normal(args.num_changes)
+
+    # Fit in an empty cache, so that the first fit is cold and the second fit
+    # starts from the parameters of the first fit.
+    directory = tempfile.mkdtemp(prefix='netmix-check-')
+    previous_cache_directory = os.environ.get('NETMIX_CACHE_DIR')
+    os.environ['NETMIX_CACHE_DIR'] = directory
+    try:
+        cold_mu, cold_alpha, cold_num_iter = cached_em(x, return_num_iter=True)
+        warm_mu, warm_alpha, warm_num_iter = cached_em(y, return_num_iter=True)
+        refit_mu, refit_alpha, refit_num_iter = cached_em(y, refit=True, return_num_iter=True)
+    finally:
+        if previous_cache_directory is None:
+            del os.environ['NETMIX_CACHE_DIR']
+        else:
+            os.environ['NETMIX_CACHE_DIR'] = previous_cache_directory
+        shutil.rmtree(directory, ignore_errors=True)
+
+    rows = [
+        ['cold', str(cold_mu), str(cold_alpha), str(np.size(cold_num_iter)), str(np.max(cold_num_iter)), str(np.sum(cold_num_iter))],
+        ['warm', str(warm_mu), str(warm_alpha), str(np.size(warm_num_iter)), str(np.max(warm_num_iter)), str(np.sum(warm_num_iter))],
+        ['refit', str(refit_mu), str(refit_alpha), str(np.size(refit_num_iter)), str(np.max(refit_num_iter)), str(np.sum(refit_num_iter))],
+    ]
+    print('\n'.join('\t'.join(row) for row in [['fit', 'mu', 'alpha', 'num_starts', 'max_num_iter', 'total_num_iter']]+rows))
+
+    if np.size(warm_num_iter)!=1:
+        sys.stderr.write('The second fit was not warm-started.\n')
+        sys.exit(1)
+    if args.ratio*np.sum(warm_num_iter)>np.sum(refit_num_iter):
+        sys.stderr.write('The warm fit took {} iterations; the cold fit took {}.\n'.format(np.sum(warm_num_iter), np.sum(refit_num_iter)))
+        sys.exit(1)
+
+if __name__=='__main__':
+    run(get_parser().parse_args(sys.argv[1:]))
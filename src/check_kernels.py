@@ -0,0 +1,113 @@
+#!/usr/bin/python
+
+# Load packages.
+import sys, argparse
+import numpy as np, scipy as sp, scipy.stats
+
+from common import log_pdf, pdf, cdf, sf, isf, log_odds, likelihood_ratio, log_likelihood_ratio, log_likelihood_sum, responsibility, log_responsibility
+
+# Parse arguments.
+def get_parser():
+    parser = argparse.ArgumentParser(description='Compare the normal and mixture functions in common with scipy.stats.norm on scalars, lists, and arrays.')
+    parser.add_argument('-rtol', '--relative_tolerance', type=float, default=1e-10, help='Relative tolerance in double precision')
+    parser.add_argument('-rtol32', '--float32_relative_tolerance', type=float, default=1e-4, help='Relative tolerance in single precision')
+    parser.add_argument('-o', '--output_file', type=str, required=False, help='Output file; defaults to standard output')
+    return parser
+
+# Define functions.
+def reference_functions():
+    '''
+    Return the scipy.stats.norm implementation of each function, i.e., the
+    implementation of the functions before they were computed with ufuncs.  The
+    normal functions take mu and sigma, and the mixture functions take mu and
+    alpha.
+    '''
+    def a(x, mu, alpha):
+        return alpha*sp.stats.norm.pdf(x, mu)
+
+    def b(x, mu, alpha):
+        return (1-alpha)*sp.stats.norm.pdf(x)
+
+    return {
+        'log_pdf': (log_pdf, lambda x, mu, sigma: sp.stats.norm.logpdf(x, mu, sigma)),
+        'pdf': (pdf, lambda x, mu, sigma: sp.stats.norm.pdf(x, mu, sigma)),
+        'cdf': (cdf, lambda x, mu, sigma: sp.stats.norm.cdf(x, mu, sigma)),
+        'sf': (sf, lambda x, mu, sigma: sp.stats.norm.sf(x, mu, sigma)),
+        'log_odds': (log_odds, lambda x, mu, alpha: np.log(a(x, mu, alpha))-np.log(b(x, mu, alpha))),
+        'likelihood_ratio': (likelihood_ratio, lambda x, mu, alpha: b(x, mu, alpha)/a(x, mu, alpha)),
+        'log_likelihood_ratio': (log_likelihood_ratio, lambda x, mu, alpha: np.log(a(x, mu, alpha))-np.log(b(x, mu, alpha))),
+        'log_likelihood_sum': (log_likelihood_sum, lambda x, mu, alpha: np.nansum(np.log(a(x, mu, alpha)+b(x, mu, alpha)))),
+        'responsibility': (responsibility, lambda x, mu, alpha: a(x, mu, alpha)/(a(x, mu, alpha)+b(x, mu, alpha))),
+        'log_responsibility': (log_responsibility, lambda x, mu, alpha: np.log(a(x, mu, alpha))-np.log(a(x, mu, alpha)+b(x, mu, alpha))),
+    }
+
+def test_inputs():
+    '''
+    Return named scores of each kind that scipy.stats.norm accepts.
+    '''
+    x = np.linspace(-5, 5, 101)
+    return [
+        ('float', 1.5),
+        ('int', 2),
+        ('0-d array', np.array(-0.5)),
+        ('list', [1.0, 2.0, -3.0]),
+        ('tuple', (0.0, 4.0)),
+        ('int array', np.arange(-3, 4)),
+        ('array', x),
+        ('2-d array', np.reshape(x[:100], (10, 10))),
+    ]
+
+def is_close(result, reference, rtol):
+    return np.shape(result)==np.shape(reference) and np.isscalar(result)==np.isscalar(reference) and np.allclose(result, reference, rtol=rtol, atol=0.0, equal_nan=True)
+
+def compare(name, function, reference_function, x, rtol, rtol32):
+    '''
+    Compare a function with its reference in double precision, in single
+    precision, and with an out array; return whether each comparison passes.
+    '''
+    parameters = (1.0, 1.5) if name in ('log_pdf', 'pdf', 'cdf', 'sf') else (2.0, 0.1)
+    reference = reference_function(x, *parameters)
+    passes = [is_close(function(x, *parameters), reference, rtol)]
+
+    if name!='log_likelihood_sum':
+        passes.append(np.allclose(function(x, *parameters, dtype=np.float32), reference, rtol=rtol32, atol=0.0))
+        out = np.empty(np.shape(reference))
+        result = function(x, *parameters, out=out)
+        passes.append(np.allclose(out, reference, rtol=rtol, atol=0.0) and np.allclose(result, reference, rtol=rtol, atol=0.0))
+
+    return all(passes)
+
+# Run script.
+def run(args):
+    rows = list()
+    num_failed = 0
+    for name, (function, reference_function) in reference_functions().items():
+        for kind, x in test_inputs():
+            try:
+                passed = compare(name, function, reference_function, x, args.relative_tolerance, args.float32_relative_tolerance)
+            except Exception as e:
+                sys.stderr.write('{} failed on {} scores: {}\n'.format(name, kind, e))
+                passed = False
+            num_failed += not passed
+            rows.append([name, kind, str(passed)])
+
+    # The inverse survival function takes probabilities rather than scores.
+    q = [0.5, 1e-3, 1e-10]
+    for kind, x in [('float', 0.05), ('list', q), ('array', np.array(q))]:
+        passed = is_close(isf(x), sp.stats.norm.isf(x), args.relative_tolerance) and is_close(isf(x, 1.0, 2.0), sp.stats.norm.isf(x, 1.0, 2.0), args.relative_tolerance)
+        num_failed += not passed
+        rows.append(['isf', kind, str(passed)])
+
+    output_string = '\n'.join('\t'.join(row) for row in [['function', 'scores', 'matches_scipy']]+rows)
+    if args.output_file is None:
+        print(output_string)
+    else:
+        with open(args.output_file, 'w') as f:
+            f.write(output_string)
+
+    if num_failed:
+        sys.stderr.write('{} comparison(s) with scipy.stats.norm failed.\n'.format(num_failed))
+        sys.exit(1)
+
+if __name__=='__main__':
+    run(get_parser().parse_args(sys.argv[1:]))
@@ -1,6 +1,10 @@
 #!/usr/bin/python
 
-import math, numpy as np, scipy as sp, scipy.stats
+import math, numpy as np, scipy as sp, scipy.sparse, scipy.special
+import os, sys, gc, shutil, tempfile
+
+from fileio import open_file, write_lines
+from telemetry import enabled, record, stage
 
 ################################################################################
 #
@@ -9,41 +13,124 @@ import math, numpy as np, scipy as sp, scipy.stats
 ################################################################################
 
 # Define functions.
-def pdf(x, mu=0.0, sigma=1.0):
-    return sp.stats.norm.pdf(x, mu, sigma)
 
-def cdf(x, mu=0.0, sigma=1.0):
-    return sp.stats.norm.cdf(x, mu, sigma)
+# The normal distribution functions are computed directly with ufuncs rather
+# than with scipy.stats.norm, which checks its arguments on every call.  The
+# mixture functions are computed from the log-odds of the altered component,
+# log(alpha*pdf(x, mu)) - log((1-alpha)*pdf(x)), which is linear in x, so that
+# they do not underflow for large scores.  Each function takes an optional out
+# array, and dtype=np.float32 computes in single precision.  Like scipy, the
+# functions accept scalars and lists and return a scalar for scalar inputs.
+log_sqrt_2pi = 0.5*math.log(2*math.pi)
+
+def as_float_array(x, dtype=None):
+    x = np.asarray(x)
+    return x.astype(dtype if dtype is not None else np.result_type(x.dtype, np.float64), copy=False)
+
+def output_array(out, dtype, *args):
+    '''
+    Return out or, if out is None, a new array with the broadcast shape of args,
+    so that the functions below can compute in place even for scalar inputs.
+    '''
+    return out if out is not None else np.empty(np.broadcast(*args).shape, dtype=dtype)
+
+def as_result(out):
+    return out[()] if np.ndim(out)==0 else out
+
+def log_pdf(x, mu=0.0, sigma=1.0, out=None, dtype=None):
+    x = as_float_array(x, dtype)
+    out = output_array(out, x.dtype, x, mu, sigma)
+    np.subtract(x, mu, out=out)
+    out /= sigma
+    np.square(out, out=out)
+    out *= -0.5
+    out -= np.log(sigma)+log_sqrt_2pi
+    return as_result(out)
 
-def sf(x, mu=0.0, sigma=1.0):
-    return sp.stats.norm.sf(x, mu, sigma)
+def pdf(x, mu=0.0, sigma=1.0, out=None, dtype=None):
+    x = as_float_array(x, dtype)
+    out = output_array(out, x.dtype, x, mu, sigma)
+    log_pdf(x, mu, sigma, out)
+    return as_result(np.exp(out, out=out))
 
-def likelihood_ratio(x, mu, alpha):
-    a = alpha*pdf(x, mu)
-    b = (1-alpha)*pdf(x)
-    return b/a
+def cdf(x, mu=0.0, sigma=1.0, out=None, dtype=None):
+    x = as_float_array(x, dtype)
+    out = output_array(out, x.dtype, x, mu, sigma)
+    np.subtract(x, mu, out=out)
+    out /= sigma
+    return as_result(sp.special.ndtr(out, out=out))
 
-def log_likelihood_ratio(x, mu, alpha):
-    a = alpha*pdf(x, mu)
-    b = (1-alpha)*pdf(x)
-    return np.log(a)-np.log(b)
+def sf(x, mu=0.0, sigma=1.0, out=None, dtype=None):
+    x = as_float_array(x, dtype)
+    out = output_array(out, x.dtype, x, mu, sigma)
+    np.subtract(mu, x, out=out)
+    out /= sigma
+    return as_result(sp.special.ndtr(out, out=out))
+
+def isf(q, mu=0.0, sigma=1.0, out=None, dtype=None):
+    q = as_float_array(q, dtype)
+    out = output_array(out, q.dtype, q, mu, sigma)
+    sp.special.ndtri(q, out=out)
+    out *= -sigma
+    out += mu
+    return as_result(out)
+
+def log_odds(x, mu, alpha, out=None, dtype=None):
+    '''
+    Compute the log-odds log(alpha*pdf(x, mu)) - log((1-alpha)*pdf(x)) of the
+    altered component; mu and alpha broadcast against x, e.g., mu and alpha
+    with shape (k, 1) give k rows of log-odds.
+    '''
+    x = as_float_array(x, dtype)
+    mu = np.asarray(mu)
+    alpha = np.asarray(alpha)
+    out = output_array(out, x.dtype, x, mu, alpha)
+    with np.errstate(divide='ignore'):
+        offset = np.log(alpha)-np.log1p(-alpha)-0.5*mu**2
+    np.multiply(x, mu, out=out)
+    out += offset
+    return as_result(out)
+
+def likelihood_ratio(x, mu, alpha, out=None, dtype=None):
+    x = as_float_array(x, dtype)
+    out = output_array(out, x.dtype, x, mu, alpha)
+    log_odds(x, mu, alpha, out)
+    np.negative(out, out=out)
+    return as_result(np.exp(out, out=out))
+
+def log_likelihood_ratio(x, mu, alpha, out=None, dtype=None):
+    return log_odds(x, mu, alpha, out, dtype)
 
 def log_likelihood_sum(x, mu, alpha):
-    a = alpha*pdf(x, mu)
-    b = (1-alpha)*pdf(x)
-    return np.nansum(np.log(a+b))
+    with np.errstate(divide='ignore'):
+        a = np.asarray(log_pdf(x, mu))
+        a += np.log(alpha)
+        b = log_pdf(x)
+        b += np.log1p(-alpha)
+    return np.nansum(np.logaddexp(a, b, out=a))
+
+def responsibility(x, mu, alpha, out=None, dtype=None):
+    x = as_float_array(x, dtype)
+    out = output_array(out, x.dtype, x, mu, alpha)
+    log_odds(x, mu, alpha, out)
+    return as_result(sp.special.expit(out, out=out))
 
-def responsibility(x, mu, alpha):
-    a = alpha*pdf(x, mu)
-    b = (1-alpha)*pdf(x)
-    return a/(a+b)
+def log_responsibility(x, mu, alpha, out=None, dtype=None):
+    x = as_float_array(x, dtype)
+    out = output_array(out, x.dtype, x, mu, alpha)
+    log_odds(x, mu, alpha, out)
+    np.negative(out, out=out)
+    np.logaddexp(0, out, out=out)
+    return as_result(np.negative(out, out=out))
 
-def log_responsibility(x, mu, alpha):
-    a = alpha*pdf(x, mu)
-    b = (1-alpha)*pdf(x)
-    return np.log(a)-np.log(a+b)
+def has_converged(current_log_likelihood, previous_log_likelihood, tol):
+    '''
+    Return whether EM has converged, i.e., whether the log-likelihood changed
+    by at most tol relative to its previous value.
+    '''
+    return np.abs(current_log_likelihood-previous_log_likelihood)<=tol*np.abs(previous_log_likelihood)
 
-def single_em(x, mu=0.0, alpha=0.5, tol=1e-3, max_num_iter=10**3):
+def single_em(x, mu=0.0, alpha=0.5, tol=1e-6, max_num_iter=10**3):
     x = np.asarray(x)
     a = np.zeros(np.shape(x))
     b = np.zeros(np.shape(x))
@@ -65,37 +152,396 @@ def single_em(x, mu=0.0, alpha=0.5, tol=1e-3, max_num_iter=10**3):
 
         # Check for convergence.
         current_log_likelihood = log_likelihood_sum(x, mu, alpha)
-        if current_log_likelihood<(1+tol)*previous_log_likelihood:
+        if has_converged(current_log_likelihood, previous_log_likelihood, tol):
             break
         else:
             previous_log_likelihood = current_log_likelihood
 
     return mu, alpha
 
-def em(x, tol=1e-3, max_num_iter=10**3, num_trials=10):
-    x = np.sort(np.asarray(x).flatten())[::-1]
-    n = np.size(x)
+def multi_log_likelihood_sum(x, mu, alpha, out=None):
+    '''
+    Compute the log-likelihood for each pair of parameters in mu and alpha; x
+    is either one score vector shared by all pairs or an array with one row of
+    scores per pair.  Uses log(a+b) = log(b) + log(1+a/b) with closed-form
+    Gaussian log-densities, so that only one temporary array is needed.
+    '''
+    x = np.asarray(x)
+    mu = np.atleast_1d(mu)
+    alpha = np.atleast_1d(alpha)
+    n = np.shape(x)[-1]
+    sum_squares = np.dot(x, x) if np.ndim(x)==1 else np.einsum('ij,ij->i', x, x)
+
+    t = log_odds(x, mu[:, np.newaxis], alpha[:, np.newaxis], out=out)
+    np.logaddexp(0, t, out=t)
+
+    return np.sum(t, axis=1) + n*np.log1p(-alpha) - 0.5*sum_squares - 0.5*n*np.log(2*np.pi)
+
+def multi_em(x, mu, alpha, tol=1e-6, max_num_iter=10**3, rows=None):
+    '''
+    Perform EM from several starts at once; equivalent to calling single_em on
+    each pair of initial parameters in mu and alpha.  Starts are advanced
+    together on an array of shape (number of starts, size of x), and starts
+    that have converged are removed from subsequent iterations.
+
+    If x is a matrix, then rows gives the row of x that each start fits.
+
+    Return the arrays of estimated mu, estimated alpha, final log-likelihoods,
+    and numbers of iterations for the starts.
+    '''
+    x = np.asarray(x, dtype=np.float64)
+    mu = np.array(mu, dtype=np.float64, ndmin=1)
+    alpha = np.array(alpha, dtype=np.float64, ndmin=1)
+    num_starts = np.size(mu)
+
+    if np.ndim(x)==1:
+        shared = True
+    else:
+        shared = False
+        rows = np.arange(num_starts) if rows is None else np.asarray(rows)
+    n = np.shape(x)[-1]
+
+    buf = np.empty((num_starts, n))
+    x_buf = None if shared else np.empty((num_starts, n))
+    num_iter = np.zeros(num_starts, dtype=np.int64)
+    active = np.ones(num_starts, dtype=bool)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        y = x if shared else np.take(x, rows, axis=0, out=x_buf)
+        log_likelihood = multi_log_likelihood_sum(y, mu, alpha, out=buf)
+
+        for _ in range(max_num_iter):
+            indices = np.flatnonzero(active)
+            num_active = np.size(indices)
+            if not num_active:
+                break
+            gamma = buf[:num_active]
+
+            # Gather the rows of x for the active starts only when the active
+            # starts change; starts only ever leave the active set.
+            if not shared and np.shape(y)[0]!=num_active:
+                y = np.take(x, rows[indices], axis=0, out=x_buf[:num_active])
+
+            # Perform E step; the responsibility a/(a+b) is the logistic
+            # function of log(a)-log(b), which is linear in x.
+            log_odds(y, mu[indices, np.newaxis], alpha[indices, np.newaxis], out=gamma)
+            sp.special.expit(gamma, out=gamma)
+
+            # Perform M step.
+            sum_gamma = np.sum(gamma, axis=1)
+            sum_gamma_x = np.dot(gamma, y) if shared else np.einsum('ij,ij->i', gamma, y)
+            mu[indices] = sum_gamma_x/sum_gamma
+            alpha[indices] = sum_gamma/n
+            num_iter[indices] += 1
+
+            # Check for convergence.
+            current_log_likelihood = multi_log_likelihood_sum(y, mu[indices], alpha[indices], out=gamma)
+            active[indices] = ~has_converged(current_log_likelihood, log_likelihood[indices], tol)
+            log_likelihood[indices] = current_log_likelihood
+
+    if enabled():
+        record('em_fit', n=n, num_starts=num_starts, max_num_iter=max_num_iter, num_iter=num_iter, converged=~active, log_likelihood=log_likelihood, mu=mu, alpha=alpha)
+
+    return mu, alpha, log_likelihood, num_iter
+
+def initialize_em(x, num_trials=10):
+    '''
+    Initialize EM algorithm by partitioning scores into high and low
+    components and using size and sample mean of higher component as estimates
+    of size and distribution mean of altered subnetwork; x has one row of
+    scores per fit.
+    '''
+    x = np.atleast_2d(x)
+    n = np.shape(x)[1]
+
+    alphas = (np.arange(num_trials)+0.5)/num_trials
+    ks = np.array([int(round(alpha*n)) for alpha in alphas])
+
+    cumulative_sums = np.cumsum(-np.sort(-x, axis=1), axis=1)
+    mus = np.zeros((np.shape(x)[0], num_trials))
+    mus[:, ks>0] = cumulative_sums[:, ks[ks>0]-1]/ks[ks>0]
+
+    return mus, np.tile(alphas, (np.shape(x)[0], 1))
+
+def em(x, tol=1e-6, max_num_iter=10**3, num_trials=10, return_num_iter=False):
+    with stage('em', n=np.size(x)):
+        x = np.sort(np.asarray(x).flatten())[::-1]
+
+        mus, alphas = initialize_em(x, num_trials)
+        mus, alphas, log_likelihoods, num_iter = multi_em(x, mus[0], alphas[0], tol, max_num_iter)
+
+        trial = np.argmax(log_likelihoods)
+
+    if return_num_iter:
+        return mus[trial], alphas[trial], num_iter
+    else:
+        return mus[trial], alphas[trial]
+
+def ks_distance(x, y):
+    '''
+    Compute the Kolmogorov-Smirnov distance between the empirical distributions
+    of x and y, which are sorted in ascending order.
+    '''
+    z = np.concatenate((x, y))
+    return np.max(np.abs(np.searchsorted(x, z, side='right')/float(len(x))-np.searchsorted(y, z, side='right')/float(len(y))))
+
+max_num_parameter_entries = 32
+
+def cached_em(x, tol=1e-6, max_num_iter=10**3, num_trials=10, max_distance=0.01, refit=False, return_num_iter=False):
+    '''
+    Perform EM through a cache of fitted parameters, keyed by the scores and
+    the EM settings.  If the scores and settings match a previous fit, then
+    return its parameters.  If the scores are within max_distance, in
+    Kolmogorov-Smirnov distance, of the scores of a previous fit with the same
+    settings, e.g., after a few scores change, then perform EM from a single
+    start at the parameters of the closest fit.  Otherwise, or if refit is
+    True, perform EM from all starts.  The cache keeps the most recently used
+    max_num_parameter_entries fits.  If return_num_iter is True, then also
+    return the numbers of iterations of the starts, which are empty for a
+    cached fit.
+    '''
+    from cache import cache_directory, array_key, list_entries, load_entry, save_entry, evict
+
+    directory = cache_directory()
+    if not directory:
+        return em(x, tol, max_num_iter, num_trials, return_num_iter)
+
+    x = np.sort(np.asarray(x, dtype=np.float64).flatten())
+    settings = np.array([tol, max_num_iter, num_trials], dtype=np.float64)
+    key = array_key('em', [x, settings])
+    distance = None
+
+    if refit:
+        status = 'refit'
+    else:
+        arrays = load_entry(os.path.join(directory, key))
+        if arrays is not None:
+            mu, alpha = np.array(arrays['parameters'])
+            if enabled():
+                record('em_cache', status='hit', n=np.size(x), mu=mu, alpha=alpha)
+            if return_num_iter:
+                return mu, alpha, np.zeros(0, dtype=np.int64)
+            else:
+                return mu, alpha
+
+        # Find the closest previous fit with the same settings.
+        closest = None
+        for _, _, path in list_entries(directory, 'em'):
+            arrays = load_entry(path, touch=False)
+            if arrays is not None and np.array_equal(arrays['settings'], settings) and np.size(arrays['scores']):
+                d = ks_distance(x, arrays['scores'])
+                if distance is None or d<distance:
+                    distance, closest = d, path
+        status = 'warm' if distance is not None and distance<=max_distance else 'miss'
+
+    if status=='warm':
+        arrays = load_entry(closest)
+        with stage('em', n=np.size(x), warm_start=True):
+            mus, alphas, _, num_iter = multi_em(x[::-1], arrays['parameters'][:1], arrays['parameters'][1:], tol, max_num_iter)
+        mu, alpha = mus[0], alphas[0]
+    else:
+        mu, alpha, num_iter = em(x, tol, max_num_iter, num_trials, return_num_iter=True)
+
+    if enabled():
+        record('em_cache', status=status, n=np.size(x), distance=distance, num_iter=num_iter, mu=mu, alpha=alpha)
+
+    save_entry(directory, key, {'scores': x, 'settings': settings, 'parameters': np.array([mu, alpha])})
+    evict(directory, np.inf, 'em', max_num_parameter_entries)
+
+    if return_num_iter:
+        return mu, alpha, num_iter
+    else:
+        return mu, alpha
+
+def em_batch(X, tol=1e-6, max_num_iter=10**3, num_trials=10, max_num_bytes=2**30):
+    '''
+    Perform EM on each row of X, e.g., on the scores of many permutations, and
+    return the arrays of estimated mu and alpha for the rows.  All starts of
+    all rows in a chunk of rows are fit together; chunks are chosen so that the
+    working arrays take about max_num_bytes.
+    '''
+    X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+    num_rows, n = np.shape(X)
+
+    # Each row in a chunk takes two arrays for initialization and two arrays
+    # for each start.
+    num_bytes_per_row = 8*n*(2+2*num_trials)
+    chunk_size = int(max(1, min(num_rows, max_num_bytes//num_bytes_per_row)))
+
+    with stage('em_batch', num_rows=num_rows, n=n):
+        mus = np.zeros(num_rows)
+        alphas = np.zeros(num_rows)
+
+        for start in range(0, num_rows, chunk_size):
+            stop = min(start+chunk_size, num_rows)
+            x = X[start:stop]
+            m = stop-start
+
+            chunk_mus, chunk_alphas = initialize_em(x, num_trials)
+            rows = np.repeat(np.arange(m), num_trials)
+            chunk_mus, chunk_alphas, log_likelihoods, _ = multi_em(x, chunk_mus.flatten(), chunk_alphas.flatten(), tol, max_num_iter, rows)
+
+            trials = np.argmax(np.reshape(log_likelihoods, (m, num_trials)), axis=1)
+            mus[start:stop] = np.reshape(chunk_mus, (m, num_trials))[np.arange(m), trials]
+            alphas[start:stop] = np.reshape(chunk_alphas, (m, num_trials))[np.arange(m), trials]
+
+    return mus, alphas
+
+def iterate_score_chunks(chunks, transform=None):
+    '''
+    Iterate over the chunks of scores given by a score file or a function that
+    returns an iterator over arrays of scores; apply transform to each chunk.
+    '''
+    iterator = iterate_node_score_chunks(chunks) if isinstance(chunks, str) else chunks()
+    for x in iterator:
+        x = np.asarray(x, dtype=np.float64).flatten()
+        yield transform(x) if transform is not None else x
+
+def streaming_initialize_em(chunks, num_trials=10, transform=None, num_bins=2**16):
+    '''
+    Compute the initial parameters of em, i.e., the means of the largest
+    scores, in three passes over chunked scores: find the range of the scores,
+    accumulate a histogram of counts and sums, and find the largest scores in
+    the bins that contain the boundaries of the initial components.
+    '''
+    # Find range of scores.
+    n = 0
+    x_min, x_max = np.inf, -np.inf
+    for x in iterate_score_chunks(chunks, transform):
+        n += np.size(x)
+        if np.size(x):
+            x_min, x_max = min(x_min, np.min(x)), max(x_max, np.max(x))
+    if not n:
+        raise Exception('No scores.')
+
+    def bin_indices(x):
+        if x_max>x_min:
+            return np.clip(((x-x_min)*(num_bins/(x_max-x_min))).astype(np.int64), 0, num_bins-1)
+        else:
+            return np.zeros(np.size(x), dtype=np.int64)
+
+    # Accumulate histogram; bins are in decreasing order of scores.
+    counts = np.zeros(num_bins, dtype=np.int64)
+    sums = np.zeros(num_bins)
+    for x in iterate_score_chunks(chunks, transform):
+        indices = num_bins-1-bin_indices(x)
+        counts += np.bincount(indices, minlength=num_bins)
+        sums += np.bincount(indices, x, minlength=num_bins)
+
+    alphas = (np.arange(num_trials)+0.5)/num_trials
+    ks = np.array([int(round(alpha*n)) for alpha in alphas])
+    cumulative_counts = np.cumsum(counts)
+    boundary_bins = np.minimum(np.searchsorted(cumulative_counts, ks), num_bins-1)
+
+    # Find the largest scores in the boundary bins.
+    boundary_bin_set = set(boundary_bins[ks>0])
+    boundary_scores = dict((b, list()) for b in boundary_bin_set)
+    for x in iterate_score_chunks(chunks, transform):
+        indices = num_bins-1-bin_indices(x)
+        for b in boundary_bin_set:
+            boundary_scores[b].append(x[indices==b])
+    boundary_scores = dict((b, np.sort(np.concatenate(y))[::-1]) for b, y in boundary_scores.items())
 
     mus = np.zeros(num_trials)
-    alphas = np.zeros(num_trials)
-    log_likelihoods = np.zeros(num_trials)
+    for trial, (k, b) in enumerate(zip(ks, boundary_bins)):
+        if k>0:
+            num_above = cumulative_counts[b-1] if b>0 else 0
+            sum_above = np.sum(sums[:b])
+            mus[trial] = (sum_above+np.sum(boundary_scores[b][:k-num_above]))/k
 
-    # Initialize EM algorithm by partitioning scores into high and low
-    # components and using size and sample mean of higher component as
-    # estimates of size and distribution mean of altered subnetwork.
-    for trial in range(num_trials):
-        alpha = (trial+0.5)/num_trials
-        k = int(round(alpha*n))
-        mu = np.mean(x[:k]) if k>0 else 0.0
+    return mus, alphas, n
 
-        mu, alpha = single_em(x, mu, alpha, tol, max_num_iter)
+def spill_score_chunks(chunks, filename, transform=None, chunk_size=2**20):
+    '''
+    Write the chunks of scores, after transform, once to a binary file of
+    doubles, and return a function that returns an iterator over chunks of
+    chunk_size scores of the memory-mapped file, so that later passes over the
+    scores do not parse text again.
+    '''
+    with open(filename, 'wb') as f:
+        for x in iterate_score_chunks(chunks, transform):
+            x.tofile(f)
+
+    if os.path.getsize(filename):
+        X = np.memmap(filename, dtype=np.float64, mode='r')
+    else:
+        X = np.empty(0)
+    return lambda: (X[i:i+chunk_size] for i in range(0, np.size(X), chunk_size))
+
+def streaming_em(chunks, tol=1e-6, max_num_iter=10**3, num_trials=10, transform=None, return_num_iter=False, directory=None):
+    '''
+    Perform EM on scores that are read in chunks, e.g., scores that do not fit
+    in memory.  The scores are given by a score file or by a function that
+    returns a new iterator over arrays of scores for each pass; transform is
+    applied to each chunk, e.g., to transform p-values to z-scores.
+
+    The scores are read and transformed once and spilled to a temporary binary
+    file in directory, which defaults to the temporary directory of the
+    system; each later pass reads the file.  Each pass accumulates the
+    log-likelihood and the sufficient statistics of the E step for every
+    active start, so memory depends only on the chunk size, and the estimates
+    agree with em up to floating-point error.  The convergence test is the one
+    of multi_em.
+    '''
+    temporary_directory = tempfile.mkdtemp(prefix='netmix-em-', dir=directory)
+    try:
+        chunks = spill_score_chunks(chunks, os.path.join(temporary_directory, 'scores.bin'), transform)
+        mu, alpha, n, log_likelihood, num_iter, is_converged = streaming_multi_em(chunks, tol, max_num_iter, num_trials)
+    finally:
+        shutil.rmtree(temporary_directory, ignore_errors=True)
+
+    if enabled():
+        record('em_fit', n=n, num_starts=num_trials, max_num_iter=max_num_iter, num_iter=num_iter, converged=is_converged, log_likelihood=log_likelihood, mu=mu, alpha=alpha)
+
+    trial = np.argmax(log_likelihood)
+    if return_num_iter:
+        return mu[trial], alpha[trial], num_iter
+    else:
+        return mu[trial], alpha[trial]
+
+def streaming_multi_em(chunks, tol=1e-6, max_num_iter=10**3, num_trials=10):
+    '''
+    Perform the passes of streaming_em over chunked scores.  Return the arrays
+    of estimated mu, estimated alpha, final log-likelihoods, numbers of
+    iterations, and convergence of the starts, and the number of scores.
+    '''
+    mu, alpha, n = streaming_initialize_em(chunks, num_trials)
 
-        mus[trial] = mu
-        alphas[trial] = alpha
-        log_likelihoods[trial] = log_likelihood_sum(x, mu, alpha)
+    num_iter = np.zeros(num_trials, dtype=np.int64)
+    log_likelihood = np.full(num_trials, np.nan)
+    active = np.ones(num_trials, dtype=bool)
+    is_converged = np.zeros(num_trials, dtype=bool)
 
-    trial = np.argmax(log_likelihoods)
-    return mus[trial], alphas[trial]
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        while np.any(active):
+            indices = np.flatnonzero(active)
+
+            # Accumulate log-likelihood of current parameters and sufficient
+            # statistics for next parameters.
+            current_log_likelihood = np.zeros(np.size(indices))
+            sum_gamma = np.zeros(np.size(indices))
+            sum_gamma_x = np.zeros(np.size(indices))
+            for x in iterate_score_chunks(chunks):
+                gamma = log_odds(x, mu[indices, np.newaxis], alpha[indices, np.newaxis])
+                current_log_likelihood += np.sum(np.logaddexp(0, gamma), axis=1) + np.size(x)*np.log1p(-alpha[indices]) - 0.5*np.dot(x, x) - 0.5*np.size(x)*np.log(2*np.pi)
+                sp.special.expit(gamma, out=gamma)
+                sum_gamma += np.sum(gamma, axis=1)
+                sum_gamma_x += np.dot(gamma, x)
+
+            # Check for convergence of the previous iteration, as in multi_em.
+            converged = (num_iter[indices]>0) & has_converged(current_log_likelihood, log_likelihood[indices], tol)
+            log_likelihood[indices] = current_log_likelihood
+            is_converged[indices[converged]] = True
+            finished = converged | (num_iter[indices]>=max_num_iter)
+            active[indices[finished]] = False
+
+            # Perform M step for the remaining starts.
+            updated = indices[~finished]
+            mu[updated] = sum_gamma_x[~finished]/sum_gamma[~finished]
+            alpha[updated] = sum_gamma[~finished]/n
+            num_iter[updated] += 1
+
+    return mu, alpha, n, log_likelihood, num_iter, is_converged
 
 ################################################################################
 #
@@ -156,6 +602,78 @@ def compute_fdr(positive, true):
     else:
         return float('nan')
 
+def indicator_matrix(sets, nodes=None):
+    '''
+    Encode node sets as a sparse boolean indicator matrix with a row for each
+    set and a column for each node.  If nodes is not given, then the nodes are
+    the sorted distinct nodes of the sets; otherwise, nodes not in nodes are
+    omitted.  Return the nodes and the indicator matrix.
+    '''
+    sizes = np.zeros(len(sets), dtype=np.int64)
+    for i, x in enumerate(sets):
+        sizes[i] = len(x)
+    rows = np.repeat(np.arange(len(sets)), sizes)
+
+    if nodes is None:
+        # Intern the nodes in order of appearance; then sort them.
+        node_to_index = dict()
+        columns = np.fromiter((node_to_index.setdefault(node, len(node_to_index)) for x in sets for node in x), dtype=np.int64, count=np.sum(sizes))
+        nodes = sorted(node_to_index, key=node_to_index.get)
+        order = sorted(range(len(nodes)), key=nodes.__getitem__)
+        ranks = np.empty(len(nodes), dtype=np.int64)
+        ranks[order] = np.arange(len(nodes))
+        nodes, columns = [nodes[k] for k in order], ranks[columns]
+    else:
+        node_to_index = dict((node, i) for i, node in enumerate(nodes))
+        columns = np.fromiter((node_to_index.get(node, -1) for x in sets for node in x), dtype=np.int64, count=np.sum(sizes))
+        rows, columns = rows[columns>=0], columns[columns>=0]
+
+    X = sp.sparse.csr_matrix((np.ones(len(rows), dtype=bool), (rows, columns)), shape=(len(sets), len(nodes)))
+    X.sum_duplicates()
+    return list(nodes), X
+
+metric_columns = ['positive', 'true', 'num_positive', 'num_true', 'num_true_positive', 'recall', 'precision', 'f_measure', 'fdr', 'jaccard_index']
+
+def compute_metrics(positive, true, cross=False):
+    '''
+    Compute the recall, precision, F-measure, FDR, and Jaccard index of many
+    pairs of positive and true sets at once.  The sets are given as indicator
+    matrices, sparse or dense, with a row for each set over the same nodes.
+    Compare row i of positive with row i of true or, if cross is True, every
+    row of positive with every row of true.  Metrics are NaN whenever
+    compute_recall_precision, compute_f_measure, compute_fdr, and
+    compute_jaccard_index return NaN.  Return a table, i.e., a record array,
+    with the columns in metric_columns.
+    '''
+    P = sp.sparse.csr_matrix(positive, dtype=bool)
+    T = sp.sparse.csr_matrix(true, dtype=bool)
+
+    num_positive = np.asarray(P.sum(axis=1), dtype=np.int64).ravel()
+    num_true = np.asarray(T.sum(axis=1), dtype=np.int64).ravel()
+
+    if cross:
+        i, j = np.meshgrid(np.arange(P.shape[0]), np.arange(T.shape[0]), indexing='ij')
+        i, j = i.ravel(), j.ravel()
+        num_true_positive = np.asarray((P.astype(np.int64)*T.astype(np.int64).T).todense()).ravel()
+    else:
+        if P.shape[0]!=T.shape[0]:
+            raise ValueError('positive and true have different numbers of sets.')
+        i = j = np.arange(P.shape[0])
+        num_true_positive = np.asarray(P.multiply(T).sum(axis=1), dtype=np.int64).ravel()
+
+    num_positive, num_true = num_positive[i], num_true[j]
+    num_union = num_positive+num_true-num_true_positive
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        has_both = (num_positive>0) & (num_true>0)
+        recall = np.where(has_both, num_true_positive/num_true.astype(np.float64), np.nan)
+        precision = np.where(has_both, num_true_positive/num_positive.astype(np.float64), np.nan)
+        f_measure = np.where(recall+precision>0, 2.0*recall*precision/(recall+precision), np.nan)
+        fdr = np.where(num_positive>0, (num_positive-num_true_positive)/num_positive.astype(np.float64), np.nan)
+        jaccard_index = np.where(num_union>0, num_true_positive/num_union.astype(np.float64), np.nan)
+
+    return np.rec.fromarrays([i, j, num_positive, num_true, num_true_positive, recall, precision, f_measure, fdr, jaccard_index], names=metric_columns)
+
 ################################################################################
 #
 # IO functions
@@ -174,7 +692,7 @@ def load_nodes(filename):
     Load nodes.
     '''
     nodes = set()
-    with open(filename, 'r') as f:
+    with open_file(filename, 'r') as f:
         for l in f:
             if not l.startswith('#'):
                 arrs = l.rstrip().split()
@@ -183,104 +701,461 @@ def load_nodes(filename):
 
 def save_nodes(filename, nodes):
     '''
-    Load nodes.
+    Save nodes.
+    '''
+    with open_file(filename, 'w') as f:
+        write_lines(f, (str(node) for node in nodes))
+
+def read_chunks(filename, chunk_size=2**26):
+    '''
+    Read a file in binary chunks of about chunk_size bytes that end at line
+    breaks; yield each chunk with the number of lines before it.
+    '''
+    with open_file(filename, 'rb') as f:
+        remainder = b''
+        num_lines = 0
+        block = f.read(chunk_size)
+        while block:
+            # Read ahead, so that the last chunk includes a last line without a
+            # line break.
+            next_block = f.read(chunk_size)
+            data = remainder+block
+            i = data.rfind(b'\n') if next_block else len(data)-1
+            if i>=0:
+                yield data[:i+1], num_lines
+                if next_block:
+                    num_lines += data.count(b'\n', 0, i+1)
+                remainder = data[i+1:]
+            else:
+                remainder = data
+            block = next_block
+
+def tokenize(data):
+    '''
+    Find the tokens, i.e., the maximal runs of non-whitespace bytes, in data;
+    omit tokens on comment lines, which start with #.  Return the byte array
+    of data and the starts, ends, line numbers, and columns of the tokens.
+    '''
+    buf = np.frombuffer(data, dtype=np.uint8)
+    is_token = (buf!=32) & ((buf<9) | (buf>13))
+
+    boundaries = np.flatnonzero(is_token[1:]!=is_token[:-1])+1
+    if np.size(buf) and is_token[0]:
+        boundaries = np.concatenate(([0], boundaries))
+    if np.size(buf) and is_token[-1]:
+        boundaries = np.concatenate((boundaries, [np.size(buf)]))
+    starts, ends = boundaries[::2], boundaries[1::2]
+
+    # Count the line breaks before each token; a line break is counted at the
+    # first token after it.
+    newlines = np.flatnonzero(buf==10)
+    lines = np.cumsum(np.bincount(np.searchsorted(starts, newlines), minlength=np.size(starts)+1)[:np.size(starts)])
+    if b'#' in data:
+        line_starts = np.concatenate(([0], newlines+1))
+        is_data = buf[line_starts[lines]]!=ord('#')
+        starts, ends, lines = starts[is_data], ends[is_data], lines[is_data]
+
+    indices = np.arange(np.size(lines))
+    is_first = np.concatenate(([True], lines[1:]!=lines[:-1])) if np.size(lines) else np.zeros(0, dtype=bool)
+    columns = indices-np.maximum.accumulate(np.where(is_first, indices, 0)) if np.size(lines) else indices
+
+    return buf, starts, ends, lines, columns
+
+def gather_tokens(buf, starts, ends, dtype=np.uint8):
+    '''
+    Gather tokens into a matrix with a row for each token and a column for each
+    byte, padded with zeros.
+    '''
+    lengths = ends-starts
+    width = int(np.max(lengths)) if np.size(lengths) else 1
+
+    # Copy the window of width bytes at the start of each token and zero the
+    # bytes after the end of the token.
+    padded = np.concatenate((buf, np.zeros(width, dtype=np.uint8)))
+    windows = np.lib.stride_tricks.as_strided(padded, shape=(np.size(buf), width), strides=(1, 1), writeable=False)
+    A = windows[starts]
+    A *= np.arange(width)<lengths[:, None]
+    return A if dtype==np.uint8 else A.astype(dtype)
+
+def token_array(buf, starts, ends):
+    '''
+    Gather tokens into a fixed-width bytes array.
+    '''
+    A = gather_tokens(buf, starts, ends)
+    return A.view('S{}'.format(A.shape[1])).ravel()
+
+def token_string_array(buf, starts, ends):
+    '''
+    Gather tokens into a fixed-width string array.  ASCII bytes are their own
+    code points, so ASCII tokens are widened instead of decoded; otherwise, only
+    the distinct tokens are decoded.
+    '''
+    if not np.size(buf) or np.max(buf)<128:
+        A = gather_tokens(buf, starts, ends, np.uint32)
+        return A.view('U{}'.format(A.shape[1])).ravel()
+    tokens, inverse = np.unique(token_array(buf, starts, ends), return_inverse=True)
+    return decode_strings(tokens)[inverse]
+
+def decode_strings(A):
     '''
-    with open(filename, 'w') as f:
-        f.write('\n'.join(str(node) for node in nodes))
+    Decode a bytes array to a string array.
+    '''
+    try:
+        return A.astype(str)
+    except UnicodeDecodeError:
+        return np.char.decode(A, 'utf-8')
+
+max_num_reported_lines = 10
+
+def invalid_line_message(data, lines, num_previous_lines, description):
+    '''
+    Describe the first max_num_reported_lines invalid lines of a chunk, given
+    by their indices in the chunk, and count the others.  The line breaks are
+    found once for the chunk.
+    '''
+    newlines = np.flatnonzero(np.frombuffer(data, dtype=np.uint8)==ord('\n'))
+    line_starts = np.concatenate(([0], newlines+1))
+    line_ends = np.concatenate((newlines, [len(data)]))
+
+    messages = ['Line {}: {} is not a valid {}; input line omitted.'.format(num_previous_lines+i+1, data[line_starts[i]:line_ends[i]].strip().decode('utf-8', 'replace'), description)
+        for i in lines[:max_num_reported_lines]]
+    if len(lines)>max_num_reported_lines:
+        messages.append('... and {} more invalid lines.'.format(len(lines)-max_num_reported_lines))
+    return '\n'.join(messages)
+
+def parse_node_score_chunk(data, num_previous_lines=0):
+    '''
+    Parse the node scores in a chunk of a node score file.  Return a bytes array
+    of the nodes and an array of their scores.
+    '''
+    buf, starts, ends, lines, columns = tokenize(data)
+
+    # Each noncomment line must have a node and a score.
+    counts = np.bincount(lines) if np.size(lines) else np.zeros(0, dtype=np.int64)
+    invalid_lines = np.flatnonzero((counts>0) & (counts!=2))
+    is_valid = counts[lines]==2
+
+    nodes = token_array(buf, starts[is_valid & (columns==0)], ends[is_valid & (columns==0)])
+    values = token_array(buf, starts[is_valid & (columns==1)], ends[is_valid & (columns==1)])
+    try:
+        scores = values.astype(np.float64)
+    except ValueError:
+        invalid_values = [not is_number(value) for value in values]
+        invalid_lines = np.union1d(invalid_lines, lines[is_valid & (columns==1)][invalid_values])
+
+    if np.size(invalid_lines):
+        raise Warning(invalid_line_message(data, invalid_lines, num_previous_lines, 'node score'))
+
+    return nodes, scores
+
+def parse_node_score(filename, chunk_size=2**26):
+    '''
+    Parse node scores in bulk.  Return arrays of the nodes and their scores in
+    the order of the file, omitting nonfinite scores.
+    '''
+    node_arrays = list()
+    score_arrays = list()
+
+    for data, num_previous_lines in read_chunks(filename, chunk_size):
+        nodes, scores = parse_node_score_chunk(data, num_previous_lines)
+        node_arrays.append(nodes)
+        score_arrays.append(scores)
+
+    nodes = decode_strings(np.concatenate(node_arrays)) if node_arrays else np.zeros(0, dtype=str)
+    scores = np.concatenate(score_arrays) if score_arrays else np.zeros(0)
+
+    is_finite = np.isfinite(scores)
+    return nodes[is_finite], scores[is_finite]
+
+def iterate_node_score_chunks(filename, chunk_size=2**26):
+    '''
+    Iterate over the finite scores of a node score file in chunks of about
+    chunk_size bytes.
+    '''
+    for data, num_previous_lines in read_chunks(filename, chunk_size):
+        _, scores = parse_node_score_chunk(data, num_previous_lines)
+        yield scores[np.isfinite(scores)]
 
 def load_node_score(filename):
     '''
     Load node scores.
     '''
-    node_to_score = dict()
-    with open(filename, 'r') as f:
-        for l in f:
-            if not l.startswith('#'):
-                arrs = l.strip().split()
-                if len(arrs)==2:
-                    node = arrs[0]
-                    if is_number(arrs[1]):
-                        score = float(arrs[1])
-                        if np.isfinite(score):
-                            node_to_score[node] = score
-                    else:
-                        raise Warning('{} is not a valid node score; input line omitted.'.format(l.strip()))
-                elif arrs:
-                    raise Warning('{} is not a valid node score; input line omitted.'.format(l.strip()))
+    names, scores = parse_node_score(filename)
+    node_to_score = dict(zip(names.tolist(), scores.tolist()))
 
     if not node_to_score:
         raise Exception('No node scores; check {}.'.format(filename))
 
     return node_to_score
 
+def load_node_score_arrays(filename):
+    '''
+    Load node scores through the cache.  Return the sorted nodes and an array of
+    their scores.
+    '''
+    from cache import load_cached_arrays
+
+    def parse(filename):
+        names, scores = parse_node_score(filename)
+        if not np.size(names):
+            raise Exception('No node scores; check {}.'.format(filename))
+
+        # Keep the last score of each node, as in load_node_score.
+        nodes, indices = np.unique(names[::-1], return_index=True)
+        return {'nodes': nodes, 'scores': scores[::-1][indices]}
+
+    with stage('load_scores', filename=filename) as info:
+        arrays = load_cached_arrays(filename, 'scores', parse)
+        info['num_nodes'] = len(arrays['nodes'])
+
+    return list(arrays['nodes']), arrays['scores']
+
 def save_node_score(filename, node_to_score, reverse=True):
     '''
     Save node scores.
     '''
     node_score_list = sorted(node_to_score.items(), key=lambda node_score: (-float(node_score[1]) if reverse else float(node_score[1]), node_score[0]))
-    with open(filename, 'w') as f:
-        f.write('\n'.join('{}\t{}'.format(node, score) for node, score in node_score_list))
+    with open_file(filename, 'w') as f:
+        write_lines(f, ('{}\t{}'.format(node, score) for node, score in node_score_list))
+
+def parse_edge_list(filename, chunk_size=2**26, decode=True):
+    '''
+    Parse edge list in bulk.  Return arrays of the sources and targets of the
+    edges in the order of the file; the arrays are bytes arrays if decode is
+    False.
+    '''
+    source_arrays = list()
+    target_arrays = list()
+
+    for data, num_previous_lines in read_chunks(filename, chunk_size):
+        buf, starts, ends, lines, columns = tokenize(data)
+
+        # Each noncomment line must have at least two nodes.
+        counts = np.bincount(lines) if np.size(lines) else np.zeros(0, dtype=np.int64)
+        invalid_lines = np.flatnonzero(counts==1)
+        if np.size(invalid_lines):
+            raise Warning(invalid_line_message(data, invalid_lines, num_previous_lines, 'edge'))
+
+        gather = token_string_array if decode else token_array
+        source_arrays.append(gather(buf, starts[columns==0], ends[columns==0]))
+        target_arrays.append(gather(buf, starts[columns==1], ends[columns==1]))
+
+    if not source_arrays:
+        empty_array = np.zeros(0, dtype='U1' if decode else 'S1')
+        return empty_array, empty_array
+    elif len(source_arrays)==1:
+        return source_arrays[0], target_arrays[0]
+    else:
+        return np.concatenate(source_arrays), np.concatenate(target_arrays)
 
 def load_edge_list(filename):
     '''
     Load edge list.
     '''
-    edge_list = list()
-    with open(filename, 'r') as f:
-        for l in f:
-            if not l.startswith('#'):
-                arrs = l.strip().split()
-                if len(arrs)>=2:
-                    u, v = arrs[:2]
-                    edge_list.append((u, v))
-                elif arrs:
-                    raise Warning('{} is not a valid edge; input line omitted.'.format(l.strip()))
+    sources, targets = parse_edge_list(filename)
+
+    # Building millions of tuples triggers many garbage collections, none of
+    # which can free anything.
+    is_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        edge_list = list(zip(sources.tolist(), targets.tolist()))
+    finally:
+        if is_enabled:
+            gc.enable()
 
     if not edge_list:
         raise Exception('Edge list has no edges; check {}.'.format(filename))
 
     return edge_list
 
-def save_edge_list(filename, edge_list):
+def format_integer_rows(A):
     '''
-    Save edge list.
+    Format the rows of an array of nonnegative integers as tab-separated lines
+    of bytes.
     '''
+    A = np.asarray(A)
+    num_rows, num_columns = np.shape(A)
+    if not np.size(A):
+        return b''
 
-    with open(filename, 'w') as f:
-        f.write('\n'.join('\t'.join(map(str, edge)) for edge in edge_list))
+    width = len(str(int(np.max(A))))
+    x = A.astype(np.uint32 if np.max(A)<2**32 else np.uint64)
+    digits = np.empty((num_rows, num_columns, width+1), dtype=np.uint8)
+    is_digit = np.empty((num_rows, num_columns, width+1), dtype=bool)
+    for j in range(width-1, -1, -1):
+        digits[:, :, j] = x%10
+        is_digit[:, :, j] = x>0
+        x //= 10
+    digits[:, :, :width] += ord('0')
+    digits[:, :, width] = ord('\t')
+    digits[:, -1, width] = ord('\n')
+    is_digit[:, :, width-1:] = True
+    return digits[is_digit].tobytes()
 
-def load_matrix(filename, matrix_name='A', dtype=np.float32):
+def save_edge_list(filename, edge_list, chunk_size=2**20):
     '''
-    Load matrix.
+    Save edge list.  Arrays of nonnegative integers are formatted in chunks of
+    chunk_size edges.
     '''
-    import h5py
+    if isinstance(edge_list, np.ndarray) and np.issubdtype(edge_list.dtype, np.integer) and (not np.size(edge_list) or np.min(edge_list)>=0):
+        with open_file(filename, 'wb') as f:
+            for start in range(0, len(edge_list), chunk_size):
+                data = format_integer_rows(edge_list[start:start+chunk_size])
+                f.write(data if start+chunk_size<len(edge_list) else data[:-1])
+    else:
+        with open_file(filename, 'w') as f:
+            write_lines(f, ('\t'.join(map(str, edge)) for edge in edge_list))
+
+def matrix_selection(indices):
+    '''
+    Return a selection for h5py, which reads only increasing indices, and an
+    index array, or None, that reorders the read entries as in the given slice
+    or array of indices.
+    '''
+    if indices is None:
+        return slice(None), None
+    elif isinstance(indices, slice):
+        return indices, None
+    unique_indices, inverse = np.unique(np.asarray(indices, dtype=np.int64), return_inverse=True)
+    return unique_indices, inverse
 
-    f = h5py.File(filename, 'r')
-    if matrix_name in f:
-        A = np.asarray(f[matrix_name].value, dtype=dtype)
+def read_matrix_block(dataset, rows=None, columns=None):
+    '''
+    Read the given rows and columns, each a slice or an array of indices, of an
+    h5py dataset without reading the rest of it.
+    '''
+    row_selection, row_order = matrix_selection(rows)
+    column_selection, column_order = matrix_selection(columns)
+
+    # h5py reads at most one array of indices at once, so read the span of the
+    # rows if both rows and columns are arrays.
+    if row_order is not None and column_order is not None:
+        start = int(row_selection[0]) if len(row_selection) else 0
+        stop = int(row_selection[-1])+1 if len(row_selection) else 0
+        A = dataset[start:stop, column_selection][row_selection-start]
     else:
-        raise KeyError('Matrix {} is not in {}.'.format(matrix_name, filename))
-    f.close()
+        A = dataset[row_selection, column_selection]
+
+    if row_order is not None:
+        A = A[row_order]
+    if column_order is not None:
+        A = A[:, column_order]
+    return A
+
+def load_matrix(filename, matrix_name='A', dtype=np.float32, rows=None, columns=None):
+    '''
+    Load matrix, or only the given rows and columns, each a slice or an array
+    of indices.
+    '''
+    import h5py
+
+    with h5py.File(filename, 'r') as f:
+        if matrix_name not in f:
+            raise KeyError('Matrix {} is not in {}.'.format(matrix_name, filename))
+        A = np.asarray(read_matrix_block(f[matrix_name], rows, columns), dtype=dtype)
     return A
 
-def save_matrix(filename, A, matrix_name='A', dtype=np.float32):
+def save_matrix(filename, A, matrix_name='A', dtype=np.float32, chunks=None, compression=None):
     '''
-    Save matrix.
+    Save matrix.  If chunks is given, e.g., a shape or True, then the matrix is
+    stored in chunks, optionally compressed, e.g., with gzip, so that rows can
+    be appended to it with append_matrix.
     '''
     import h5py
 
-    f = h5py.File(filename, 'a')
-    if matrix_name in f:
-        del f[matrix_name]
-    f[matrix_name] = np.asarray(A, dtype=dtype)
-    f.close()
+    A = np.asarray(A, dtype=dtype)
+    with h5py.File(filename, 'a') as f:
+        if matrix_name in f:
+            del f[matrix_name]
+        if chunks is None:
+            f[matrix_name] = A
+        else:
+            f.create_dataset(matrix_name, data=A, chunks=chunks, compression=compression, maxshape=(None,)+A.shape[1:])
+
+def append_matrix(filename, A, matrix_name='A', dtype=np.float32, chunks=True, compression='gzip'):
+    '''
+    Append the rows of A to a matrix saved in chunks, or save A as such a
+    matrix if there is none.  Return the number of rows of the matrix.
+    '''
+    import h5py
+
+    A = np.asarray(A, dtype=dtype)
+    with h5py.File(filename, 'a') as f:
+        if matrix_name not in f:
+            f.create_dataset(matrix_name, data=A, chunks=chunks, compression=compression, maxshape=(None,)+A.shape[1:])
+            return len(A)
+
+        dataset = f[matrix_name]
+        if dataset.shape[1:]!=A.shape[1:]:
+            raise ValueError('Cannot append rows of shape {} to matrix {} of shape {}.'.format(A.shape[1:], matrix_name, dataset.shape))
+        num_rows = dataset.shape[0]
+        dataset.resize(num_rows+len(A), axis=0)
+        dataset[num_rows:] = A
+        return dataset.shape[0]
+
+# A score store is an HDF5 file with the scores of P permutations, e.g., the
+# node scores of permuted data, as a P x n matrix in compressed chunks of about
+# score_store_chunk_size entries, and its n nodes, so that ranges of
+# permutations and subsets of nodes are read without reading the rest of the
+# matrix.  Each function opens the file itself, so that several worker
+# processes can read a store at once; appends need the only open handle.
+score_store_chunk_size = 2**18
+
+def create_score_store(filename, nodes, dtype=np.float32, num_rows_per_chunk=64, compression='gzip'):
+    '''
+    Create an empty score store for the given nodes, replacing any file.
+    '''
+    import h5py
+
+    num_rows_per_chunk = max(1, num_rows_per_chunk)
+    chunks = (num_rows_per_chunk, max(1, min(len(nodes), score_store_chunk_size//num_rows_per_chunk)))
+    with h5py.File(filename, 'w') as f:
+        f.create_dataset('nodes', data=np.array(nodes, dtype=object), dtype=h5py.string_dtype())
+        f.create_dataset('scores', shape=(0, len(nodes)), dtype=dtype, chunks=chunks, compression=compression, maxshape=(None, len(nodes)))
+
+def append_score_store(filename, X):
+    '''
+    Append rows of scores, ordered as the nodes of the store, to a score store.
+    Return the number of rows of the store.
+    '''
+    return append_matrix(filename, np.atleast_2d(X), 'scores', dtype=None)
+
+def load_score_store_nodes(filename):
+    import h5py
+
+    with h5py.File(filename, 'r') as f:
+        return [node.decode('utf-8') if isinstance(node, bytes) else node for node in f['nodes'][()]]
+
+def num_score_store_rows(filename):
+    import h5py
+
+    with h5py.File(filename, 'r') as f:
+        return f['scores'].shape[0]
+
+def load_score_store(filename, rows=None, nodes=None, dtype=np.float32):
+    '''
+    Load the given rows, a slice or an array of indices, of a score store and
+    the columns of the given nodes, or of all nodes.  Return the nodes and the
+    scores.
+    '''
+    store_nodes = load_score_store_nodes(filename)
+    if nodes is None:
+        return store_nodes, load_matrix(filename, 'scores', dtype, rows)
+
+    node_to_index = dict((node, i) for i, node in enumerate(store_nodes))
+    missing_nodes = [node for node in nodes if node not in node_to_index]
+    if missing_nodes:
+        raise KeyError('{} nodes, e.g., {}, are not in {}.'.format(len(missing_nodes), missing_nodes[0], filename))
+    columns = np.array([node_to_index[node] for node in nodes], dtype=np.int64)
+    return list(nodes), load_matrix(filename, 'scores', dtype, rows, columns)
 
 def save_subgraph_size(filename, num):
     '''
     Save number of nodes in altered subgraph
     '''
 
-    with open(filename, 'w') as f:
+    with open_file(filename, 'w') as f:
         f.write(str(num))
 
 def status(message=''):
@@ -0,0 +1,37 @@
+#!/usr/bin/python
+
+# Load packages.
+import sys, argparse
+
+from common import load_nodes, indicator_matrix, compute_metrics, metric_columns
+from telemetry import start_trace
+
+# Parse arguments.
+def get_parser():
+    parser = argparse.ArgumentParser(description='Compare result sets with true sets.')
+    parser.add_argument('-rf', '--result_files', type=str, nargs='+', required=True, help='Result files, e.g., subnetworks')
+    parser.add_argument('-tf', '--true_files', type=str, nargs='+', required=True, help='True node files, e.g., implanted nodes')
+    parser.add_argument('-c', '--cross', action='store_true', help='Compare every result file with every true file instead of pairing them in order')
+    parser.add_argument('-o', '--output_file', type=str, required=True, help='Output table')
+    parser.add_argument('--profile', type=str, required=False, help='Append telemetry to this JSON-lines trace file')
+    return parser
+
+# Run script.
+def run(args):
+    start_trace(args.profile)
+
+    if not args.cross and len(args.result_files)!=len(args.true_files):
+        raise ValueError('Give as many result files as true files or compare them with --cross.')
+
+    # Encode all sets over the same nodes.
+    sets = [load_nodes(filename) for filename in args.result_files+args.true_files]
+    _, X = indicator_matrix(sets)
+    num_results = len(args.result_files)
+    metrics = compute_metrics(X[:num_results], X[num_results:], args.cross)
+
+    rows = [[args.result_files[metric.positive], args.true_files[metric.true]]+[str(metric[column]) for column in metric_columns[2:]] for metric in metrics]
+    with open(args.output_file, 'w') as f:
+        f.write('\n'.join('\t'.join(row) for row in [['result_file', 'true_file']+metric_columns[2:]]+rows))
+
+if __name__=='__main__':
+    run(get_parser().parse_args(sys.argv[1:]))
@@ -0,0 +1,64 @@
+#!/usr/bin/python
+
+# Load packages.
+import numpy as np
+import sys, argparse
+
+from common import load_node_score_arrays, save_nodes
+from graph import map_graph_files, graph_summary
+from mwcs import mwcs, decomposed_mwcs, reduce_mwcs, expand_mwcs_solution
+from telemetry import enabled, start_trace, stage
+
+# Parse arguments.
+def get_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-i', '--input_file', type=str, required=True, help='Score file')
+    parser.add_argument('-elf', '--edge_list_file', type=str, nargs='+', required=True, help='Edge list files')
+    parser.add_argument('-nc', '--num_cores', type=int, default=1, help='Number of cores')
+    parser.add_argument('-t', '--time_limit', type=float, required=False, help='Maximum number of seconds')
+    parser.add_argument('-ni', '--max_num_iter', type=int, default=100, help='Maximum number of local search iterations per start')
+    parser.add_argument('-ns', '--num_starts', type=int, required=False, help='Number of starts; defaults to number of cores')
+    parser.add_argument('-s', '--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('-r', '--reduce', action='store_true', help='Reduce the instance before solving it')
+    parser.add_argument('-d', '--decompose', action='store_true', help='Reduce the instance and solve its connected components on separate cores')
+    parser.add_argument('-o', '--output_file', type=str, nargs='+', required=True, help='Subset files, one for each edge list file')
+    parser.add_argument('--profile', type=str, required=False, help='Append telemetry to this JSON-lines trace file')
+    return parser
+
+# Define functions.
+def mwcs_subset(edge_list_file, A, num_cores, scores, time_limit, max_num_iter, num_starts, seed, reduce=False, decompose=False):
+    with stage('mwcs_subset', filename=edge_list_file) as info:
+        if decompose:
+            in_subgraph = decomposed_mwcs(scores, A, num_cores, time_limit, max_num_iter, num_starts, seed)
+        elif reduce:
+            reduced_scores, reduced_A, mapping = reduce_mwcs(scores, A)
+            in_subgraph = expand_mwcs_solution(mwcs(reduced_scores, reduced_A, num_cores, time_limit, max_num_iter, num_starts, seed), mapping)
+            info.update(num_reduced_nodes=len(reduced_scores), num_reduced_edges=reduced_A.nnz//2)
+        else:
+            in_subgraph = mwcs(scores, A, num_cores, time_limit, max_num_iter, num_starts, seed)
+        if enabled():
+            info.update(graph_summary(A, in_subgraph), weight=np.sum(scores[in_subgraph]))
+    return in_subgraph
+
+# Run script.
+def run(args):
+    start_trace(args.profile)
+
+    if len(args.output_file)!=len(args.edge_list_file):
+        raise ValueError('Give one output file for each edge list file.')
+
+    nodes, scores = load_node_score_arrays(args.input_file)
+    node_to_score = dict(zip(nodes, scores))
+
+    # Process the networks at once on the same nodes; each network gets the
+    # same starts as if it were run alone.
+    num_starts = args.num_starts if args.num_starts is not None else args.num_cores
+    in_subgraphs = map_graph_files(mwcs_subset, args.edge_list_file, nodes, args.num_cores, (scores, args.time_limit, args.max_num_iter, num_starts, args.seed, args.reduce, args.decompose))
+
+    for output_file, in_subgraph in zip(args.output_file, in_subgraphs):
+        subgraph = [node for node, is_in_subgraph in zip(nodes, in_subgraph) if is_in_subgraph]
+        sorted_subgraph = sorted(subgraph, key=lambda node: -node_to_score[node])
+        save_nodes(output_file, sorted_subgraph)
+
+if __name__=='__main__':
+    run(get_parser().parse_args(sys.argv[1:]))
@@ -1,39 +1,175 @@
 #!/usr/bin/python
 
 # Load packages.
-import numpy as np, networkx as nx
+import numpy as np
 import sys, argparse
 
-from common import load_node_score, load_edge_list, save_nodes
+from common import load_node_score_arrays, open_file, save_nodes, write_lines
+from graph import map_graph_files, nonsingleton_components, graph_summary
+from telemetry import enabled, start_trace, stage
 
 # Parse arguments.
 def get_parser():
     parser = argparse.ArgumentParser()
     parser.add_argument('-i', '--input_file', type=str, required=True, help='Score file')
-    parser.add_argument('-elf', '--edge_list_file', type=str, required=False, help='Edge list file')
-    parser.add_argument('-o', '--output_file', type=str, required=True, help='Subset file')
+    parser.add_argument('-elf', '--edge_list_file', type=str, nargs='+', required=False, help='Edge list files')
+    parser.add_argument('-nc', '--num_cores', type=int, default=1, help='Number of cores for processing several networks at once')
+    parser.add_argument('-o', '--output_file', type=str, nargs='+', required=True, help='Subset files, one for each edge list file')
+    parser.add_argument('-th', '--thresholds', type=float, nargs='+', required=False, help='Find the subset for each score threshold instead of 0; the output file is a table from threshold to subset')
+    parser.add_argument('-at', '--all_thresholds', action='store_true', help='Output a table with the largest threshold below which each node is in the subset, which gives the subsets for all thresholds')
+    parser.add_argument('--profile', type=str, required=False, help='Append telemetry to this JSON-lines trace file')
     return parser
 
+# Define functions.
+def compute_positive_subset(scores, A=None):
+    '''
+    Find the nodes with positive scores; if the adjacency matrix of a graph on
+    the same nodes is given, then keep only the nodes in nonsingleton connected
+    components of the induced subgraph.  Return a boolean mask of the nodes.
+    '''
+    positive = np.asarray(scores)>0
+
+    if A is not None:
+        positive = nonsingleton_components(A, positive)
+
+    return positive
+
+def positive_subset(edge_list_file, A, num_cores, scores):
+    with stage('positive_subset', filename=edge_list_file) as info:
+        positive = compute_positive_subset(scores, A)
+        if enabled() and A is not None:
+            info.update(graph_summary(A, positive))
+    return positive
+
+def subset_thresholds(scores, A=None):
+    '''
+    Compute the threshold of each node such that the node is in the positive
+    subset of scores-t, i.e., in a nonsingleton connected component of the
+    subgraph induced by the nodes with scores above t, for every t below its
+    threshold.  A node is in such a component if and only if the node and one
+    of its neighbors have scores above t.
+    '''
+    scores = np.asarray(scores, dtype=np.float64)
+    if A is None:
+        return scores.copy()
+
+    max_neighbor_scores = np.full(len(scores), -np.inf)
+    has_neighbors = np.diff(A.indptr)>0
+    if np.any(has_neighbors):
+        max_neighbor_scores[has_neighbors] = np.maximum.reduceat(scores[A.indices], A.indptr[:-1][has_neighbors])
+    return np.minimum(scores, max_neighbor_scores)
+
+def subset_component_sweep(scores, A, thresholds):
+    '''
+    Add the nodes in descending order of score and merge the connected
+    components of the induced subgraph with a union-find data structure in one
+    pass.  Return the number of nodes in nonsingleton components, the number
+    of nonsingleton components, and the size of the largest component of the
+    positive subset of scores-t for each threshold t.
+    '''
+    scores = np.asarray(scores, dtype=np.float64)
+    order = np.argsort(-scores, kind='stable').tolist()
+    score_list = scores.tolist()
+    indptr, indices = A.indptr.tolist(), A.indices.tolist()
+
+    parent = list(range(len(score_list)))
+    size = [1]*len(score_list)
+    added = [False]*len(score_list)
+
+    def find(i):
+        while parent[i]!=i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    num_nodes, num_components, largest_component_size = 0, 0, 0
+    results = dict()
+    k = 0
+    for threshold in sorted(set(thresholds), reverse=True):
+        while k<len(order) and score_list[order[k]]>threshold:
+            i = order[k]
+            added[i] = True
+            for j in indices[indptr[i]:indptr[i+1]]:
+                if added[j]:
+                    a, b = find(i), find(j)
+                    if a==b:
+                        continue
+                    if size[a]<size[b]:
+                        a, b = b, a
+                    num_nodes += (size[a]==1)+(size[b]==1)
+                    num_components += 1 if size[a]==1 and size[b]==1 else -1 if size[a]>1 and size[b]>1 else 0
+                    parent[b] = a
+                    size[a] += size[b]
+                    largest_component_size = max(largest_component_size, size[a])
+            k += 1
+        results[threshold] = (num_nodes, num_components, largest_component_size)
+
+    return [results[threshold] for threshold in thresholds]
+
+def positive_subset_sweep(edge_list_file, A, num_cores, scores, thresholds):
+    '''
+    Find the positive subset for each threshold, or, if thresholds is None, the
+    threshold of each node.  Without a network, the size of the largest
+    component is unknown and is None.
+    '''
+    with stage('positive_subset_sweep', filename=edge_list_file, num_thresholds=len(thresholds) if thresholds is not None else None):
+        node_thresholds = subset_thresholds(scores, A)
+        if thresholds is None:
+            return node_thresholds, None
+        elif A is None:
+            counts = [(int(np.sum(node_thresholds>threshold)),)*2+(None,) for threshold in thresholds]
+        else:
+            counts = subset_component_sweep(scores, A, thresholds)
+        return node_thresholds, counts
+
+def save_subset_sweep(filename, nodes, scores, thresholds, node_thresholds, counts):
+    '''
+    Save the threshold of each node, sorted by threshold, if thresholds is None
+    and otherwise a table from each threshold to its subset; the nodes of each
+    subset are sorted by score and separated by commas.  An unknown largest
+    component size is saved as NA.
+    '''
+    if thresholds is None:
+        order = np.lexsort((-np.asarray(scores), -node_thresholds))
+        rows = [[nodes[i], str(scores[i]), str(node_thresholds[i])] for i in order if np.isfinite(node_thresholds[i])]
+        header = ['node', 'score', 'threshold']
+    else:
+        order = np.argsort(-np.asarray(scores), kind='stable')
+        rows = list()
+        for threshold, (num_nodes, num_components, largest_component_size) in zip(thresholds, counts):
+            subset = [nodes[i] for i in order if node_thresholds[i]>threshold]
+            rows.append([str(threshold), str(num_nodes), str(num_components), str(largest_component_size) if largest_component_size is not None else 'NA', ','.join(subset)])
+        header = ['threshold', 'num_nodes', 'num_components', 'largest_component_size', 'nodes']
+
+    with open_file(filename, 'w') as f:
+        write_lines(f, ('\t'.join(row) for row in [header]+rows))
+
 # Run script.
 def run(args):
-    node_to_score = load_node_score(args.input_file)
-    positive_nodes = set(node for node, score in node_to_score.items() if score>0)
+    start_trace(args.profile)
 
-    if args.edge_list_file is not None:
-        edge_list = load_edge_list(args.edge_list_file)
+    nodes, scores = load_node_score_arrays(args.input_file)
+    node_to_score = dict(zip(nodes, scores))
 
-        G = nx.Graph()
-        G.add_edges_from(edge_list)
-        G = G.subgraph(positive_nodes)
+    # Process the networks at once on the same nodes.
+    sweep = args.thresholds is not None or args.all_thresholds
+    function, function_args = (positive_subset_sweep, (scores, args.thresholds)) if sweep else (positive_subset, (scores,))
+    if args.edge_list_file is not None:
+        if len(args.output_file)!=len(args.edge_list_file):
+            raise ValueError('Give one output file for each edge list file.')
+        results = map_graph_files(function, args.edge_list_file, nodes, args.num_cores, function_args)
+    else:
+        if len(args.output_file)!=1:
+            raise ValueError('Give one output file without an edge list file.')
+        results = [function(None, None, 1, *function_args)]
 
-        nonsingleton_components = [set(component) for component in nx.connected_components(G) if len(component)>1]
-        if nonsingleton_components:
-            positive_nodes = set.union(*nonsingleton_components)
+    for output_file, result in zip(args.output_file, results):
+        if not sweep:
+            positive_nodes = [node for node, is_positive in zip(nodes, result) if is_positive]
+            sorted_positive_nodes = sorted(positive_nodes, key=lambda node: -node_to_score[node])
+            save_nodes(output_file, sorted_positive_nodes)
         else:
-            positive_nodes = set()
-
-    sorted_positive_nodes = sorted(positive_nodes, key=lambda node: -node_to_score[node])
-    save_nodes(args.output_file, sorted_positive_nodes)
+            save_subset_sweep(output_file, nodes, scores, args.thresholds, *result)
 
 if __name__=='__main__':
     run(get_parser().parse_args(sys.argv[1:]))
@@ -1,48 +1,162 @@
 #!/usr/bin/python
 
 # Load packages.
-import numpy as np, networkx as nx
-import sys, argparse
+import numpy as np
+import math, sys, argparse, heapq, multiprocessing
 
-from common import load_node_score, load_edge_list, save_nodes
+from common import load_node_score_arrays, save_nodes
+from graph import map_graph_files, degrees, graph_summary
+from telemetry import enabled, start_trace, stage
 
 # Parse arguments.
 def get_parser():
     parser = argparse.ArgumentParser()
     parser.add_argument('-i', '--input_file', type=str, required=True, help='Score file')
     parser.add_argument('-k', type=int, required=False, help='Set size')
-    parser.add_argument('-elf', '--edge_list_file', type=str, required=False, help='Edge list file')
-    parser.add_argument('-o', '--output_file', type=str, required=True, help='Set file')
+    parser.add_argument('-kmin', '--min_size', type=int, required=False, help='Minimum set size; defaults to 2 with an edge list and 1 otherwise')
+    parser.add_argument('-kmax', '--max_size', type=int, required=False, help='Maximum set size; defaults to number of positive scores')
+    parser.add_argument('-elf', '--edge_list_file', type=str, nargs='+', required=False, help='Edge list files')
+    parser.add_argument('-ns', '--num_seeds', type=int, default=100, help='Number of highest-scoring seed nodes')
+    parser.add_argument('-nc', '--num_cores', type=int, default=1, help='Number of cores')
+    parser.add_argument('-o', '--output_file', type=str, nargs='+', required=True, help='Set files, one for each edge list file')
+    parser.add_argument('--profile', type=str, required=False, help='Append telemetry to this JSON-lines trace file')
     return parser
 
+# Define functions.
+def scan_statistic_prefix(scores, min_size=1, max_size=None):
+    '''
+    Find the set of nodes with sizes in the given range that maximizes the scan
+    statistic, i.e., the sum of the scores over the square root of the size,
+    ignoring the graph.  Return a boolean mask of the nodes.
+    '''
+    n = len(scores)
+    max_size = n if max_size is None else min(max_size, n)
+    indices = np.argsort(scores)[::-1]
+
+    set_scores = np.cumsum(scores[indices])/np.sqrt(np.arange(1, n+1))
+    set_scores[:min_size-1] = -np.inf
+    set_scores[max_size:] = -np.inf
+    set_size = np.argmax(set_scores)+1 if np.max(set_scores)>0 else 0
+
+    in_set = np.zeros(n, dtype=bool)
+    in_set[indices[:set_size]] = True
+    return in_set
+
+def grow_connected_set(indptr, indices, scores, seed, min_size, max_size):
+    '''
+    Grow a connected set from a seed node by adding the highest-scoring node on
+    its frontier; return the scan statistic and nodes of the best set with size
+    in the given range along the way.  The graph is given by the lists indptr
+    and indices of its CSR adjacency matrix.
+    '''
+    order = [seed]
+    total = scores[seed]
+    best_statistic = total if min_size<=1 else float('-inf')
+    best_size = 1 if min_size<=1 else 0
+
+    visited = set([seed])
+    frontier = list()
+    for j in indices[indptr[seed]:indptr[seed+1]]:
+        visited.add(j)
+        frontier.append((-scores[j], j))
+    heapq.heapify(frontier)
+
+    while frontier and len(order)<max_size:
+        _, i = heapq.heappop(frontier)
+        order.append(i)
+        total += scores[i]
+
+        size = len(order)
+        if size>=min_size:
+            statistic = total/math.sqrt(size)
+            if statistic>best_statistic:
+                best_statistic, best_size = statistic, size
+
+        for j in indices[indptr[i]:indptr[i+1]]:
+            if j not in visited:
+                visited.add(j)
+                heapq.heappush(frontier, (-scores[j], j))
+
+    return best_statistic, order[:best_size]
+
+def initialize_worker(A, scores, min_size, max_size):
+    global worker_indptr, worker_indices, worker_scores, worker_min_size, worker_max_size
+    worker_indptr = A.indptr.tolist()
+    worker_indices = A.indices.tolist()
+    worker_scores = np.asarray(scores).tolist()
+    worker_min_size = min_size
+    worker_max_size = max_size
+
+def grow_from_seed(seed):
+    return grow_connected_set(worker_indptr, worker_indices, worker_scores, seed, worker_min_size, worker_max_size)
+
+def connected_scan_statistic(scores, A, min_size=2, max_size=None, num_seeds=100, num_cores=1):
+    '''
+    Find a connected set of nodes with size in the given range and a large scan
+    statistic by growing sets from the highest-scoring nodes in parallel.
+    Return a boolean mask of the nodes.
+    '''
+    n = len(scores)
+    if max_size is None:
+        max_size = max(min_size, int(np.sum(scores>0)))
+
+    candidates = np.flatnonzero(degrees(A)>0)
+    seeds = candidates[np.argsort(-scores[candidates], kind='stable')[:num_seeds]].tolist()
+
+    if num_cores==1:
+        initialize_worker(A, scores, min_size, max_size)
+        results = list(map(grow_from_seed, seeds))
+    else:
+        pool = multiprocessing.Pool(num_cores, initialize_worker, (A, scores, min_size, max_size))
+        results = pool.map(grow_from_seed, seeds)
+        pool.close()
+        pool.join()
+
+    in_set = np.zeros(n, dtype=bool)
+    if results:
+        best_statistic, best_set = max(results, key=lambda result: result[0])
+        if best_statistic>0:
+            in_set[best_set] = True
+    return in_set
+
+def scan_statistic_subset(edge_list_file, A, num_cores, scores, min_size, max_size, num_seeds):
+    with stage('scan_statistic_subset', filename=edge_list_file) as info:
+        in_set = connected_scan_statistic(scores, A, min_size, max_size, num_seeds, num_cores)
+        if enabled():
+            info.update(graph_summary(A, in_set))
+    return in_set
+
 # Run script.
 def run(args):
-    node_to_score = load_node_score(args.input_file)
+    start_trace(args.profile)
 
-    nodes = sorted(node_to_score)
-    scores = np.asarray([node_to_score[node] for node in nodes])
-    indices = np.argsort(scores)[::-1]
-    n = len(nodes)
+    nodes, scores = load_node_score_arrays(args.input_file)
+    node_to_score = dict(zip(nodes, scores))
 
-    set_scores = np.cumsum(scores[indices])/np.sqrt(np.arange(1, n+1))
-    set_size = np.argmax(set_scores)+1 if set_scores[0]>0 else 0
-    set_nodes = [nodes[i] for i in indices[:set_size]]
+    if args.k is not None:
+        min_size, max_size = args.k, args.k
+    else:
+        min_size, max_size = args.min_size, args.max_size
 
     if args.edge_list_file is not None:
-        edge_list = load_edge_list(args.edge_list_file)
+        if len(args.output_file)!=len(args.edge_list_file):
+            raise ValueError('Give one output file for each edge list file.')
 
-        G = nx.Graph()
-        G.add_edges_from(edge_list)
-        G = G.subgraph(set_nodes)
+        # Process the networks at once on the same nodes.
+        in_sets = map_graph_files(scan_statistic_subset, args.edge_list_file, nodes, args.num_cores, (np.asarray(scores), min_size or 2, max_size, args.num_seeds))
+    else:
+        if len(args.output_file)!=1:
+            raise ValueError('Give one output file without an edge list file.')
 
-        nonsingleton_components = [set(component) for component in nx.connected_components(G) if len(component)>1]
-        if nonsingleton_components:
-            set_nodes = set.union(*nonsingleton_components)
-        else:
-            set_nodes = set()
+        with stage('scan_statistic_subset') as info:
+            in_set = scan_statistic_prefix(np.asarray(scores), min_size or 1, max_size)
+            info['num_nodes'] = int(np.sum(in_set))
+        in_sets = [in_set]
 
-    sorted_nodes = sorted(set_nodes, key=lambda node: -node_to_score[node])
-    save_nodes(args.output_file, sorted_nodes)
+    for output_file, in_set in zip(args.output_file, in_sets):
+        set_nodes = [node for node, is_in_set in zip(nodes, in_set) if is_in_set]
+        sorted_nodes = sorted(set_nodes, key=lambda node: -node_to_score[node])
+        save_nodes(output_file, sorted_nodes)
 
 if __name__=='__main__':
     run(get_parser().parse_args(sys.argv[1:]))
@@ -1,10 +1,11 @@
 #!/usr/bin/python
 
 # Load packages.
-import math, numpy as np, scipy as sp, scipy.stats
-import os, sys, argparse
+import numpy as np
+import sys, argparse
 
-from common import em, responsibility, log_likelihood_ratio, load_node_score, save_node_score, load_nodes,save_subgraph_size
+from common import cached_em, isf, responsibility, log_likelihood_ratio, load_node_score_arrays, save_node_score, load_nodes,save_subgraph_size
+from telemetry import start_trace, stage
 
 # Parse arguments.
 def get_parser():
@@ -16,66 +17,77 @@ def get_parser():
     parser.add_argument('-onf', '--outlier_node_file', type=str, required=False, help='Outlier node file')
     parser.add_argument('-o', '--output_file', type=str, required=True, help='Output score file')
     parser.add_argument('-os', '--output_size_file', type=str, help='Output file for size of subgraph')
+    parser.add_argument('--refit', action='store_true', help='Fit mixture model from all starts instead of from cached parameters')
+    parser.add_argument('--profile', type=str, required=False, help='Append telemetry to this JSON-lines trace file')
     return parser
 
-# Run script.
-def run(args):
-    # Load data.
-    node_to_score = load_node_score(args.input_file)
-
-    nodes = sorted(node_to_score)
-    scores = np.array([node_to_score[node] for node in nodes])
-    n = len(scores)
-
-    # Transform p-values to z-scores, i.e., z = \Phi^{-1}(1 - p).
-    if not args.z_scores:
-        scores = np.clip(scores, 2.2e-308, 1-2.2e-16)
-        scores = sp.stats.norm.isf(scores)
-
-    # Estimate mixture model parameters; remove potential outlier nodes from fit.
-    if args.outlier_node_file is None:
-        mu, alpha = em(scores)
-    else:
-        outlier_node_set = load_nodes(args.outlier_node_file)
-        non_outlier_node_set = set(nodes) - outlier_nodes
-        non_outlier_nodes = sorted(nonoutlier_node_set)
-        non_outlier_scores = np.array([node_to_score[node] for node in non_outlier_nodes])
-        mu, alpha = em(non_outlier_scores)
+# Define functions.
+def transform_scores(scores):
+    '''
+    Transform p-values to z-scores.
+    '''
+    scores = np.clip(scores, 2.2e-308, 1-2.2e-16)
+    return isf(scores)
 
+def compute_scores(scores, mu, alpha, score_choice='responsibilities', threshold_choice='mixing_proportions', num_outliers=0):
+    '''
+    Compute shifted node scores from z-scores and mixture model parameters.
+    '''
     # Compute scores.
-    if args.score_choice in ['r', 'responsibility', 'responsibilities']:
+    if score_choice in ['r', 'responsibility', 'responsibilities']:
         scores = responsibility(scores, mu, alpha)
-    elif args.score_choice in ['llr', 'log_likelihood_ratio', 'log_likelihood_ratios']:
+    elif score_choice in ['llr', 'log_likelihood_ratio', 'log_likelihood_ratios']:
         scores = log_likelihood_ratio(scores, mu, alpha)
-    elif args.score_choice in ['z', 'z-score', 'z-scores', 'z_score', 'z_scores']:
-        pass
+    elif score_choice in ['z', 'z-score', 'z-scores', 'z_score', 'z_scores']:
+        scores = np.array(scores, dtype=np.float64)
     else:
         raise NotImplementedError('{} score not implemented'.format(score_choice))
 
     # Shift scores.
-    if args.threshold_choice in ['mixing_proportions']:
-        if args.outlier_node_file is None:
-            n = np.size(scores)
-            k = int(round(alpha*n))
-            sorted_scores = np.sort(scores)[::-1]
-            threshold = 0.5*(sorted_scores[max(0, k-1)] + sorted_scores[min(k, n-1)])
-            scores -= threshold
-        else:
-            n = np.size(scores)
-            k = int(round(alpha*n)) + len(outlier_nodes)
-            sorted_scores = np.sort(scores)[::-1]
-            threshold = 0.5*(sorted_scores[max(0, k-1)] + sorted_scores[min(k, n-1)])
-            scores -= threshold
-    elif args.threshold_choice in ['natural']:
-        if args.score_choice in ['r', 'responsibility', 'responsibilities']:
+    if threshold_choice in ['mixing_proportions']:
+        n = np.size(scores)
+        k = int(round(alpha*n)) + num_outliers
+        sorted_scores = np.sort(scores)[::-1]
+        threshold = 0.5*(sorted_scores[max(0, k-1)] + sorted_scores[min(k, n-1)])
+        scores -= threshold
+    elif threshold_choice in ['natural']:
+        if score_choice in ['r', 'responsibility', 'responsibilities']:
             scores -= 0.5
-        elif args.score_choice in ['llr', 'log_likelihood_ratio', 'log_likelihood_ratios', 'z', 'z-score', 'z-scores', 'z_score', 'z_scores']:
+        elif score_choice in ['llr', 'log_likelihood_ratio', 'log_likelihood_ratios', 'z', 'z-score', 'z-scores', 'z_score', 'z_scores']:
             pass
         else:
             raise NotImplementedError('{} score not implemented'.format(score_choice))
-    elif args.threshold_choice in ['none']:
+    elif threshold_choice in ['none']:
         pass # do nothing
 
+    return scores
+
+# Run script.
+def run(args):
+    start_trace(args.profile)
+
+    # Load data.
+    nodes, scores = load_node_score_arrays(args.input_file)
+
+    # Transform p-values to z-scores, i.e., z = \Phi^{-1}(1 - p).
+    if not args.z_scores:
+        scores = transform_scores(scores)
+
+    # Estimate mixture model parameters; remove potential outlier nodes from fit.
+    if args.outlier_node_file is None:
+        mu, alpha = cached_em(scores, refit=args.refit)
+        num_outliers = 0
+    else:
+        outlier_nodes = load_nodes(args.outlier_node_file) & set(nodes)
+        non_outlier_scores = np.array([score for node, score in zip(nodes, scores) if node not in outlier_nodes])
+        mu, alpha = cached_em(non_outlier_scores, refit=args.refit)
+        num_outliers = len(outlier_nodes)
+
+    # Compute scores.
+    with stage('compute_scores', score_choice=args.score_choice, threshold_choice=args.threshold_choice, mu=mu, alpha=alpha) as info:
+        scores = compute_scores(scores, mu, alpha, args.score_choice, args.threshold_choice, num_outliers)
+        info['num_positive'] = int(np.sum(scores>0))
+
     # Save results.
     node_to_score = dict(zip(nodes, scores))
     save_node_score(args.output_file, node_to_score)
@@ -1,35 +1,180 @@
 #!/usr/bin/python
 
 # Load modules.
-import sys, argparse
+import numpy as np, scipy as sp, scipy.special
+import sys, argparse, multiprocessing
 
-from common import load_node_score
+from common import cached_em, load_node_score, load_node_score_arrays, load_nodes, create_score_store, append_score_store, load_score_store, num_score_store_rows
+from compute_scores import transform_scores, compute_scores
+from compute_positive_subset import compute_positive_subset
+from graph import load_graph_file
+from telemetry import start_trace, stage
 
 # Parse arguments.
 def get_parser():
     description = 'Evaluate statistical significance.'
     parser = argparse.ArgumentParser(description=description)
-    parser.add_argument('-osf', '--observed_score_file', type=str, required=True, help='Observed score file')
-    parser.add_argument('-orf', '--observed_results_file', type=str, required=True, help='Observed results file')
-    parser.add_argument('-psf', '--permuted_score_files', type=str, required=True, nargs='*', help='Permuted score files')
-    parser.add_argument('-prf', '--permuted_results_files', type=str, required=True, nargs='*', help='Permuted results files')
+
+    # Permute scores in memory.
+    parser.add_argument('-i', '--input_file', type=str, required=False, help='Input score file; permute scores in memory')
+    parser.add_argument('-z', '--z_scores', action='store_true', help='Input score file already contains z-scores')
+    parser.add_argument('-elf', '--edge_list_file', type=str, required=False, help='Edge list file')
+    parser.add_argument('-np', '--num_permutations', type=int, default=1000, help='Maximum number of permutations')
+    parser.add_argument('-bs', '--batch_size', type=int, default=10, help='Number of permutations in each task')
+    parser.add_argument('-nc', '--num_cores', type=int, default=1, help='Number of cores')
+    parser.add_argument('-s', '--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('-sl', '--significance_level', type=float, default=0.05, help='Significance level for early stopping')
+    parser.add_argument('-cl', '--confidence_level', type=float, required=False, help='Stop early once the p-value is above or below the significance level with this confidence')
+    parser.add_argument('-mnp', '--min_num_permutations', type=int, default=100, help='Minimum number of permutations before early stopping')
+
+    # Use existing permuted scores and results.
+    parser.add_argument('-osf', '--observed_score_file', type=str, required=False, help='Observed score file')
+    parser.add_argument('-orf', '--observed_results_file', type=str, required=False, help='Observed results file')
+    parser.add_argument('-psf', '--permuted_score_files', type=str, required=False, nargs='*', help='Permuted score files')
+    parser.add_argument('-prf', '--permuted_results_files', type=str, required=False, nargs='*', help='Permuted results files')
+    parser.add_argument('-pss', '--permuted_score_store', type=str, required=False, help='HDF5 score store with a row of permuted scores for each permutation; written with an input score file and read instead of permuted score files otherwise')
+
     parser.add_argument('-o', '--output_file', type=str, required=True, help='Output file')
+    parser.add_argument('--profile', type=str, required=False, help='Append telemetry to this JSON-lines trace file')
     return parser
 
+# Define functions.
+def compute_subnetwork_score(scores, A=None):
+    '''
+    Find the positive subnetwork for the given node scores and return the sum
+    of the scores of its nodes.
+    '''
+    return np.sum(scores[compute_positive_subset(scores, A)])
+
+def initialize_worker(scores, A, seed, return_scores=False):
+    global worker_scores, worker_A, worker_seed, worker_return_scores
+    worker_scores = scores
+    worker_A = A
+    worker_seed = seed
+    worker_return_scores = return_scores
+
+def compute_permuted_subnetwork_scores(permutation_range):
+    '''
+    Permute node scores and find subnetwork scores for each permutation in the
+    given range.  Each permutation has its own random seed, so that results do
+    not depend on the number of cores.  Return the subnetwork scores and, if
+    requested, the node scores of each permutation.
+
+    Permuting the node scores is the same as permuting the z-scores and then
+    fitting the mixture model and scoring the nodes: a permutation has the same
+    scores as the observed data, the fit depends only on the scores and not on
+    their order, and each node score depends only on its z-score, the fit, and
+    a threshold chosen from the sorted scores.  Only the rounding of the EM
+    sums may differ.
+    '''
+    start, stop = permutation_range
+    S = np.array([np.random.RandomState([worker_seed, i]).permutation(worker_scores) for i in range(start, stop)])
+    return [compute_subnetwork_score(scores, worker_A) for scores in S], S if worker_return_scores else None
+
+def confidence_interval(num_extreme, num_total, confidence_level):
+    '''
+    Compute Clopper-Pearson confidence interval for a p-value.
+    '''
+    a = 1.0-confidence_level
+    lower = sp.special.betaincinv(num_extreme, num_total-num_extreme+1, 0.5*a) if num_extreme>0 else 0.0
+    upper = sp.special.betaincinv(num_extreme+1, num_total-num_extreme, 1.0-0.5*a) if num_extreme<num_total else 1.0
+    return lower, upper
+
+def permutation_test(scores, A, observed_subnetwork_score, num_permutations=1000, batch_size=10, num_cores=1, seed=0, significance_level=0.05, confidence_level=None, min_num_permutations=100, score_store=None, nodes=None):
+    '''
+    Compute the subnetwork scores of permutations of the observed node scores
+    over a pool of processes; see compute_permuted_subnetwork_scores.  Stop
+    early if a confidence level is given and the p-value is clearly above or
+    below the significance level.  If a score store file is given, then the
+    node scores of each permutation are appended to it, in permutation order,
+    as the permutations finish.
+    '''
+    permutation_ranges = [(start, min(start+batch_size, num_permutations)) for start in range(0, num_permutations, batch_size)]
+
+    if num_cores==1:
+        pool = None
+        initialize_worker(scores, A, seed, score_store is not None)
+        results = map(compute_permuted_subnetwork_scores, permutation_ranges)
+    else:
+        pool = multiprocessing.Pool(num_cores, initialize_worker, (scores, A, seed, score_store is not None))
+        results = pool.imap(compute_permuted_subnetwork_scores, permutation_ranges)
+
+    if score_store is not None:
+        create_score_store(score_store, nodes)
+
+    # Check the stopping rule in permutation order, so that the result does not
+    # depend on the number of cores.
+    permuted_subnetwork_scores = list()
+    num_extreme_permuted_scores = 0
+    for batch, S in results:
+        if score_store is not None:
+            append_score_store(score_store, S)
+        for permuted_subnetwork_score in batch:
+            permuted_subnetwork_scores.append(permuted_subnetwork_score)
+            num_extreme_permuted_scores += permuted_subnetwork_score>=observed_subnetwork_score
+
+        num_total_permuted_scores = len(permuted_subnetwork_scores)
+        if confidence_level is not None and num_total_permuted_scores>=min_num_permutations:
+            lower, upper = confidence_interval(num_extreme_permuted_scores, num_total_permuted_scores, confidence_level)
+            if upper<significance_level or lower>significance_level:
+                break
+
+    if pool is not None:
+        pool.terminate()
+        pool.join()
+
+    return permuted_subnetwork_scores
+
 # Run script.
 def run(args):
-    # Find observed subnetwork score.
-    observed_node_to_score = load_node_score(args.observed_score_file)
-    observed_results = load_nodes(args.observed_results_file)
-    observed_subnetwork_score = sum(observed_node_to_score[node] for node in observed_results)
+    start_trace(args.profile)
 
-    # Find permuted subnetwork scores.
-    permuted_subnetwork_scores = list()
-    for permuted_score_file, permuted_results_file in zip(args.permuted_score_files, args.permuted_score_files):
-        permuted_node_to_score = load_node_score(args.permuted_score_file)
-        permuted_results = load_nodes(args.permuted_results_file)
-        permuted_subnetwork_score = sum(permuted_node_to_score[node] for node in permuted_results)
-        permuted_subnetwork_scores.append(permuted_subnetwork_score)
+    if args.input_file is not None:
+        # Load data.
+        nodes, z_scores = load_node_score_arrays(args.input_file)
+        if not args.z_scores:
+            z_scores = transform_scores(z_scores)
+
+        if args.edge_list_file is not None:
+            _, A = load_graph_file(args.edge_list_file, nodes)
+        else:
+            A = None
+
+        # Find observed and permuted subnetwork scores.
+        # Fit the mixture model and score the nodes once; each permutation
+        # permutes the node scores.
+        mu, alpha = cached_em(z_scores)
+        scores = compute_scores(z_scores, mu, alpha)
+        observed_subnetwork_score = compute_subnetwork_score(scores, A)
+        with stage('permutation_test', num_cores=args.num_cores) as info:
+            permuted_subnetwork_scores = permutation_test(scores, A, observed_subnetwork_score, args.num_permutations, args.batch_size,
+                args.num_cores, args.seed, args.significance_level, args.confidence_level, args.min_num_permutations, args.permuted_score_store, nodes)
+            info['num_permutations'] = len(permuted_subnetwork_scores)
+
+    elif args.observed_score_file and args.observed_results_file and (args.permuted_score_files or args.permuted_score_store) and args.permuted_results_files:
+        # Find observed subnetwork score.
+        observed_node_to_score = load_node_score(args.observed_score_file)
+        observed_results = load_nodes(args.observed_results_file)
+        observed_subnetwork_score = sum(observed_node_to_score[node] for node in observed_results)
+
+        # Find permuted subnetwork scores, reading only the scores of the nodes
+        # of each permuted subnetwork from a score store.
+        permuted_subnetwork_scores = list()
+        if args.permuted_score_store:
+            if num_score_store_rows(args.permuted_score_store)<len(args.permuted_results_files):
+                raise ValueError('{} has fewer permutations than permuted results files.'.format(args.permuted_score_store))
+            for i, permuted_results_file in enumerate(args.permuted_results_files):
+                _, S = load_score_store(args.permuted_score_store, slice(i, i+1), load_nodes(permuted_results_file), dtype=np.float64)
+                permuted_subnetwork_scores.append(float(np.sum(S)))
+        else:
+            for permuted_score_file, permuted_results_file in zip(args.permuted_score_files, args.permuted_results_files):
+                permuted_node_to_score = load_node_score(permuted_score_file)
+                permuted_results = load_nodes(permuted_results_file)
+                permuted_subnetwork_score = sum(permuted_node_to_score[node] for node in permuted_results)
+                permuted_subnetwork_scores.append(permuted_subnetwork_score)
+
+    else:
+        raise ValueError('Provide an input score file or observed and permuted score and results files.')
 
     # Compute subnetwok scores.
     expected_subnetwork_score = np.mean(permuted_subnetwork_scores)
@@ -39,7 +184,7 @@ def run(args):
     num_total_permuted_scores = len(permuted_subnetwork_scores)
     p_value = float(num_extreme_permuted_scores)/float(num_total_permuted_scores)
 
-    output_string = 'Observed subnetwork score: {}\nExpected subnetwork score: {}\np-value: {}'.format(observed_subnetwork_score, expected_subnetwork_score, p_value)
+    output_string = 'Observed subnetwork score: {}\nExpected subnetwork score: {}\np-value: {}\nNumber of permutations: {}'.format(observed_subnetwork_score, expected_subnetwork_score, p_value, num_total_permuted_scores)
     with open(args.output_file, 'w') as f:
         f.write(output_string)
 
@@ -0,0 +1,102 @@
+#!/usr/bin/python
+
+import os, sys, contextlib, io, itertools
+
+################################################################################
+#
+# File functions
+#
+################################################################################
+
+# These functions import neither numpy nor scipy, so that scripts that only
+# read and write text, e.g., process_heinz_output.py, start quickly; common
+# imports them for its load and save functions.
+
+# The load and save functions read from standard input or write to standard
+# output for the filename -.  They read files compressed with gzip, bzip2, xz,
+# or zstd, which they recognize by the first bytes of the file, and they
+# compress output files named, e.g., *.gz or *.zst.  zstd needs the zstandard
+# package.
+compression_magic_numbers = [(b'\x1f\x8b', 'gzip'), (b'BZh', 'bzip2'), (b'\xfd7zXZ\x00', 'xz'), (b'\x28\xb5\x2f\xfd', 'zstd')]
+compression_extensions = {'.gz': 'gzip', '.bz2': 'bzip2', '.xz': 'xz', '.zst': 'zstd', '.zstd': 'zstd'}
+
+def compressed_stream(f, compression, is_writing):
+    '''
+    Wrap a binary file object in a stream that decompresses it or compresses to
+    it; closing the stream does not close the file object.
+    '''
+    if compression is None:
+        return f
+    elif compression=='gzip':
+        import gzip
+        return gzip.GzipFile(fileobj=f, mode='wb' if is_writing else 'rb')
+    elif compression=='bzip2':
+        import bz2
+        return bz2.BZ2File(f, 'wb' if is_writing else 'rb')
+    elif compression=='xz':
+        import lzma
+        return lzma.LZMAFile(f, 'wb' if is_writing else 'rb')
+    elif compression=='zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError('Reading or writing zstd files requires the zstandard package.')
+        if is_writing:
+            return zstandard.ZstdCompressor().stream_writer(f, closefd=False)
+        else:
+            return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True, closefd=False))
+    else:
+        raise NotImplementedError('{} compression not implemented'.format(compression))
+
+@contextlib.contextmanager
+def open_file(filename, mode='r'):
+    '''
+    Open a file, standard input, or standard output, for the filename -, for
+    reading or writing, e.g., with mode 'r', 'w', 'rb', or 'wb', and compress
+    or decompress it transparently.  Text is encoded as UTF-8.
+    '''
+    is_writing = mode[0] in 'wa'
+    if filename=='-':
+        if is_writing:
+            sys.stdout.flush()
+        f = sys.stdout.buffer if is_writing else sys.stdin.buffer
+    else:
+        f = open(filename, mode[0]+'b')
+
+    try:
+        if is_writing:
+            compression = compression_extensions.get(os.path.splitext(filename)[1].lower())
+        else:
+            header = f.peek(8)[:8]
+            compression = next((name for magic_number, name in compression_magic_numbers if header.startswith(magic_number)), None)
+
+        stream = compressed_stream(f, compression, is_writing)
+        g = stream if 'b' in mode else io.TextIOWrapper(stream, encoding='utf-8')
+        try:
+            yield g
+        finally:
+            if g is not stream:
+                g.flush()
+                g.detach()
+            if stream is not f:
+                stream.close()
+    finally:
+        if filename=='-':
+            if is_writing:
+                f.flush()
+        else:
+            f.close()
+
+def write_lines(f, lines, batch_size=2**16):
+    '''
+    Write lines separated by line breaks, without a final line break, in
+    batches of batch_size lines, so that the output is never held as one
+    string.
+    '''
+    lines = iter(lines)
+    batch = list(itertools.islice(lines, batch_size))
+    while batch:
+        f.write('\n'.join(batch))
+        batch = list(itertools.islice(lines, batch_size))
+        if batch:
+            f.write('\n')
@@ -1,10 +1,11 @@
 #!/usr/bin/python
 
 # Load packages.
-import networkx as nx
-import sys, argparse
+import numpy as np
+import sys, argparse, heapq
 
 from common import save_edge_list
+from telemetry import start_trace, stage
 
 # Parse arguments.
 def get_parser():
@@ -13,17 +14,126 @@ def get_parser():
     parser.add_argument('-m', type=int, required=True)
     parser.add_argument('-s', '--seed', type=int, required=False)
     parser.add_argument('-elf', '--edge_list_file', type=str, required=True)
+    parser.add_argument('--profile', type=str, required=False, help='Append telemetry to this JSON-lines trace file')
     return parser
 
+# Define functions.
+def slot_values(slots, sources, targets):
+    '''
+    Look up the nodes in slots of the repeated-node list, where slots 2k and
+    2k+1 hold the source and target of edge k.
+    '''
+    return np.where(slots%2==0, sources[slots//2], targets[slots//2])
+
+def slot_copies(draws):
+    '''
+    Return the edges that copy the target slot of each edge, grouped by the
+    edge that they copy, and the offsets of the groups.
+    '''
+    copiers = np.flatnonzero(draws%2==1)
+    copied = draws[copiers]//2
+    order = np.argsort(copied, kind='stable')
+    offsets = np.searchsorted(copied[order], np.arange(len(draws)+1))
+    return copiers[order], offsets
+
+def copy_targets(edges, targets, copiers, offsets):
+    '''
+    Copy the targets of edges to the edges that copy their target slots,
+    directly or through other copies, and return these edges.
+    '''
+    changed = list()
+    while np.size(edges):
+        counts = offsets[edges+1]-offsets[edges]
+        starts = np.repeat(offsets[edges]-np.cumsum(counts)+counts, counts)
+        children = copiers[starts+np.arange(np.sum(counts))]
+        targets[children] = np.repeat(targets[edges], counts)
+        changed.append(children)
+        edges = children
+    return np.concatenate(changed) if changed else np.empty(0, dtype=np.int64)
+
+def repeated_blocks(targets, blocks, m):
+    '''
+    Return the blocks of m edges, i.e., the nodes, with repeated targets.
+    '''
+    sorted_targets = np.sort(targets[blocks[:, None]*m+np.arange(m)], axis=1)
+    return blocks[np.any(sorted_targets[:, 1:]==sorted_targets[:, :-1], axis=1)]
+
+def barabasi_albert_graph(n, m, seed=None):
+    '''
+    Generate a Barabasi-Albert graph on the nodes 0, ..., n-1, which is
+    connected by construction.  Node m attaches to nodes 0, ..., m-1, and each
+    later node attaches to m distinct earlier nodes chosen with probability
+    proportional to degree, i.e., by copying uniformly random slots of the
+    repeated-node list of the earlier edges and redrawing repeated targets.
+    Return the array of edges (i, j) with i<j in sorted order.
+    '''
+    assert 1<=m<n
+    random_state = np.random.RandomState(seed)
+
+    num_edges = (n-m)*m
+    sources = np.repeat(np.arange(m, n, dtype=np.int64), m)
+    targets = np.empty(num_edges, dtype=np.int64)
+    targets[:m] = np.arange(m)
+
+    # Draw a slot before the slots of its own node for each edge; then resolve
+    # each target slot, which copies an earlier slot, by following the copies
+    # back to a source slot or to a target of node m.
+    num_slots = 2*m*(np.arange(num_edges)//m)
+    draws = (random_state.random_sample(num_edges)*num_slots).astype(np.int64)
+
+    edges = np.arange(m, num_edges)
+    slots = draws[m:]
+    while np.size(edges):
+        is_source = slots%2==0
+        targets[edges[is_source]] = sources[slots[is_source]//2]
+        edges, slots = edges[~is_source], slots[~is_source]
+
+        copies = slots//2
+        is_initial = copies<m
+        targets[edges[is_initial]] = copies[is_initial]
+        edges, slots = edges[~is_initial], draws[copies[~is_initial]]
+
+    # Redraw repeated targets of the same node from the earlier slots, in the
+    # order of the nodes, and copy each redrawn target to the later slots that
+    # copy it before the targets of later nodes are checked, so that later
+    # nodes attach to the final repeated-node list.  The targets of a node
+    # depend only on earlier nodes, whose targets are final when it is checked.
+    copiers, offsets = slot_copies(draws)
+    blocks = list(repeated_blocks(targets, np.arange(num_edges//m), m))
+    heapq.heapify(blocks)
+
+    while blocks:
+        i = heapq.heappop(blocks)
+        while blocks and blocks[0]==i:
+            heapq.heappop(blocks)
+
+        block = np.arange(i*m, (i+1)*m)
+        redrawn = list()
+        while True:
+            _, first = np.unique(targets[block], return_index=True)
+            if len(first)==m:
+                break
+            repeated = np.setdiff1d(block, block[first])
+            slots = (random_state.random_sample(len(repeated))*num_slots[repeated]).astype(np.int64)
+            targets[repeated] = slot_values(slots, sources, targets)
+            redrawn.append(repeated)
+
+        if redrawn:
+            changed = copy_targets(np.unique(np.concatenate(redrawn)), targets, copiers, offsets)
+            for j in repeated_blocks(targets, np.unique(changed//m), m):
+                heapq.heappush(blocks, j)
+
+    keys = np.sort(targets*n+sources)
+    return np.column_stack((keys//n, keys%n))
+
 # Run script.
 def run(args):
-    G = nx.barabasi_albert_graph(args.n, args.m, args.seed)
-
-    assert G.number_of_nodes()==args.n and nx.is_connected(G)
+    start_trace(args.profile)
 
-    edges = [(i+1, j+1) for i, j in G.edges()]
-    sorted_edges = sorted(sorted(edge) for edge in edges)
-    save_edge_list(args.edge_list_file, sorted_edges)
+    with stage('generate_graph', n=args.n, m=args.m) as info:
+        edges = barabasi_albert_graph(args.n, args.m, args.seed)
+        info['num_edges'] = len(edges)
+    save_edge_list(args.edge_list_file, edges+1)
 
 if __name__=='__main__':
     run(get_parser().parse_args(sys.argv[1:]))
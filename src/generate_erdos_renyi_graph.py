@@ -1,10 +1,12 @@
 #!/usr/bin/python
 
 # Load packages.
-import networkx as nx, random
+import numpy as np
 import sys, argparse
 
 from common import save_edge_list
+from graph import adjacency_matrix, connected_components
+from telemetry import start_trace, stage
 
 # Parse arguments.
 def get_parser():
@@ -14,19 +16,71 @@ def get_parser():
     parser.add_argument('-s', '--seed', type=int, required=False)
     parser.add_argument('-c', '--is_connected', action='store_true')
     parser.add_argument('-elf', '--edge_list_file', type=str, required=True)
+    parser.add_argument('--profile', type=str, required=False, help='Append telemetry to this JSON-lines trace file')
     return parser
 
+# Define functions.
+def pair_indices_to_edges(indices):
+    '''
+    Map indices of node pairs, ordered by the larger node, to edges (i, j) with
+    i<j, where pair (i, j) has index j*(j-1)/2+i.
+    '''
+    j = np.floor((1.0+np.sqrt(1.0+8.0*indices))/2.0).astype(np.int64)
+    j[j*(j-1)//2>indices] -= 1
+    j[(j+1)*j//2<=indices] += 1
+    return np.column_stack((indices-j*(j-1)//2, j))
+
+def erdos_renyi_graph(n, p, seed=None, is_connected=False):
+    '''
+    Generate a G(n, p) random graph on the nodes 0, ..., n-1 by skipping over
+    the node pairs between edges with geometrically distributed gaps.  If
+    is_connected is True, then connect each other connected component to the
+    largest connected component by an edge between uniformly random nodes.
+    Return the array of edges (i, j) with i<j in sorted order.
+    '''
+    assert 0<=p<=1
+    random_state = np.random.RandomState(seed)
+    num_pairs = n*(n-1)//2
+
+    # Draw the gaps between edges in batches until passing the last pair.
+    batches = list()
+    position = -1
+    if p>0:
+        expected_num_edges = num_pairs*p
+        batch_size = int(expected_num_edges+5.0*np.sqrt(expected_num_edges))+16
+        while position<num_pairs:
+            positions = position+np.cumsum(random_state.geometric(p, batch_size))
+            batches.append(positions[positions<num_pairs])
+            position = positions[-1]
+    indices = np.concatenate(batches) if batches else np.zeros(0, dtype=np.int64)
+    edges = pair_indices_to_edges(indices)
+
+    if is_connected and n>1:
+        labels = connected_components(adjacency_matrix(edges, n))
+        largest = np.argmax(np.bincount(labels))
+        largest_nodes = np.flatnonzero(labels==largest)
+
+        # Choose a uniformly random node from each component.
+        order = np.argsort(labels, kind='stable')
+        counts = np.bincount(labels)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        nodes = order[starts+(random_state.random_sample(len(counts))*counts).astype(np.int64)]
+        nodes = np.delete(nodes, largest)
+
+        others = largest_nodes[random_state.randint(len(largest_nodes), size=len(nodes))]
+        edges = np.concatenate((edges, np.column_stack((np.minimum(nodes, others), np.maximum(nodes, others)))))
+
+    keys = np.sort(edges[:, 0]*n+edges[:, 1])
+    return np.column_stack((keys//n, keys%n))
+
 # Run script.
 def run(args):
-    random.seed(args.seed)
-    is_connected = False
-    while not is_connected:
-        G = nx.gnp_random_graph(args.n, args.p)
-        is_connected = nx.is_connected(G)
-
-    edges = [(i+1, j+1) for i, j in G.edges()]
-    sorted_edges = sorted(sorted(edge) for edge in edges)
-    save_edge_list(args.edge_list_file, sorted_edges)
+    start_trace(args.profile)
+
+    with stage('generate_graph', n=args.n, p=args.p) as info:
+        edges = erdos_renyi_graph(args.n, args.p, args.seed, args.is_connected)
+        info['num_edges'] = len(edges)
+    save_edge_list(args.edge_list_file, edges+1)
 
 if __name__=='__main__':
     run(get_parser().parse_args(sys.argv[1:]))
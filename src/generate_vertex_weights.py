@@ -1,10 +1,12 @@
 #!/usr/bin/python
 
 # Load packages.
-import math, numpy as np, scipy as sp, scipy.stats, random, networkx as nx
+import numpy as np, random
 import sys, argparse
 
-from common import load_edge_list, save_edge_list, save_nodes, save_node_score
+from common import save_nodes, save_node_score
+from graph import load_graph_file, neighbors
+from telemetry import start_trace, stage
 
 # Parse arguments.
 def get_parser():
@@ -17,59 +19,66 @@ def get_parser():
     parser.add_argument('-nsf', '--node_score_file', type=str, required=True)
     parser.add_argument('-inf', '--implanted_nodes_file', type=str, required=True)
     parser.add_argument('-nnf', '--non_implanted_nodes_file', type=str, required=True)
+    parser.add_argument('--profile', type=str, required=False, help='Append telemetry to this JSON-lines trace file')
     return parser
 
-# Run script.
-def run(args):
-    # Load network.
-    edge_list = load_edge_list(args.edge_list_file)
+# Define functions.
+def generate_vertex_weights(A, mu, alpha, implant_seed=None, score_seed=None):
+    '''
+    Implant a connected subnetwork with a fraction alpha of the nodes, chosen by
+    a random walk on the graph, and draw N(mu, 1) scores for the implanted nodes
+    and N(0, 1) scores for the other nodes.  Scores are assigned to each set in
+    node order.  Return the scores and a boolean mask of the implanted nodes.
+    '''
+    num_nodes = A.shape[0]
 
-    G = nx.Graph()
-    G.add_edges_from(edge_list)
-
-    nodes = set(G.nodes())
-    sorted_nodes = sorted(G.nodes())
-    num_nodes = G.number_of_nodes()
-
-    assert 0<=args.alpha<=1
-    k = int(round(args.alpha*num_nodes))
+    assert 0<=alpha<=1
+    k = int(round(alpha*num_nodes))
 
     # Choose implant.
-    random.seed(args.implant_seed)
+    random.seed(implant_seed)
 
     # Traverse k distinct nodes with random walk on graph.
-    implanted_nodes = set()
+    implanted = np.zeros(num_nodes, dtype=bool)
     if k:
-        u = random.choice(sorted_nodes)
-        implanted_nodes.add(u)
-        while len(implanted_nodes)<k:
-            neighbors = sorted(G.neighbors(u))
-            u = random.choice(neighbors)
-            implanted_nodes.add(u)
-    non_implanted_nodes = nodes - implanted_nodes
+        u = random.randrange(num_nodes)
+        implanted[u] = True
+        num_implanted = 1
+        while num_implanted<k:
+            u = random.choice(neighbors(A, u))
+            if not implanted[u]:
+                implanted[u] = True
+                num_implanted += 1
 
     # Choose scores.
-    np.random.seed(args.score_seed)
-    implanted_scores = np.random.randn(k) + args.mu
+    np.random.seed(score_seed)
+    implanted_scores = np.random.randn(k) + mu
     non_implanted_scores = np.random.randn(num_nodes-k)
 
-    assert len(implanted_nodes)==len(implanted_scores)
-    assert len(non_implanted_nodes)==len(non_implanted_scores)
+    scores = np.zeros(num_nodes)
+    scores[implanted] = implanted_scores
+    scores[~implanted] = non_implanted_scores
+    return scores, implanted
 
-    # Save data.
-    implanted_nodes = sorted(implanted_nodes)
-    non_implanted_nodes = sorted(non_implanted_nodes)
+# Run script.
+def run(args):
+    start_trace(args.profile)
+
+    # Load network.
+    sorted_nodes, A = load_graph_file(args.edge_list_file)
+
+    with stage('generate_vertex_weights', mu=args.mu, alpha=args.alpha) as info:
+        scores, implanted = generate_vertex_weights(A, args.mu, args.alpha, args.implant_seed, args.score_seed)
+        info['num_implanted_nodes'] = int(np.sum(implanted))
 
-    node_to_score = dict()
-    for node, score in zip(implanted_nodes, implanted_scores):
-        node_to_score[node] = score
-    for node, score in zip(non_implanted_nodes, non_implanted_scores):
-        node_to_score[node] = score
+    # Save data.
+    node_to_score = dict(zip(sorted_nodes, scores))
 
-    implanted_nodes = sorted(implanted_nodes, key=lambda node: (-node_to_score[node], node)) if implanted_nodes else []
+    implanted_nodes = [node for node, is_implanted in zip(sorted_nodes, implanted) if is_implanted]
+    implanted_nodes = sorted(implanted_nodes, key=lambda node: (-node_to_score[node], node))
     save_nodes(args.implanted_nodes_file, implanted_nodes)
 
-    non_implanted_nodes_string = sorted(non_implanted_nodes, key=lambda node: (-node_to_score[node], node)) if non_implanted_nodes else []
+    non_implanted_nodes = [node for node, is_implanted in zip(sorted_nodes, implanted) if not is_implanted]
     save_nodes(args.non_implanted_nodes_file, non_implanted_nodes)
 
     save_node_score(args.node_score_file, node_to_score)
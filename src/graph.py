@@ -0,0 +1,199 @@
+#!/usr/bin/python
+
+import numpy as np, scipy as sp, scipy.sparse, scipy.sparse.csgraph
+
+from cache import load_cached_arrays
+from telemetry import enabled, stage
+
+################################################################################
+#
+# Graph functions
+#
+################################################################################
+
+def node_index(nodes):
+    return dict((node, i) for i, node in enumerate(nodes))
+
+def intern_nodes(names, nodes=None, node_to_index=None):
+    '''
+    Map node names to integer ids.  If nodes is not given, then the nodes are
+    the sorted distinct names; otherwise, names that are not in nodes have id
+    -1.  The index of nodes from node_index can be given to reuse it across
+    calls.  Return the nodes and the ids of the names.
+    '''
+    names = np.asarray(names, dtype=str)
+    if nodes is None:
+        nodes, ids = np.unique(names, return_inverse=True)
+        return list(nodes), np.reshape(ids, np.shape(names))
+    else:
+        if node_to_index is None:
+            node_to_index = node_index(nodes)
+        ids = np.fromiter((node_to_index.get(name, -1) for name in names.flat), dtype=np.int64, count=np.size(names))
+        return list(nodes), np.reshape(ids, np.shape(names))
+
+def adjacency_matrix(edges, n):
+    '''
+    Construct a symmetric CSR adjacency matrix from an array of edges between
+    integer ids; omit self-loops, duplicate edges, and edges with negative ids.
+    '''
+    edges = np.reshape(np.asarray(edges, dtype=np.int64), (-1, 2))
+    edges = edges[(edges[:, 0]!=edges[:, 1]) & np.all(edges>=0, axis=1)]
+
+    rows = np.concatenate((edges[:, 0], edges[:, 1]))
+    cols = np.concatenate((edges[:, 1], edges[:, 0]))
+
+    A = sp.sparse.csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(n, n))
+    A.sum_duplicates()
+    A.data[:] = 1
+    return A
+
+def load_graph(edge_list, nodes=None):
+    '''
+    Construct a graph from an edge list of node names.  If nodes is given, then
+    the graph has these nodes and omits edges with other nodes.  Return the
+    nodes and the CSR adjacency matrix.
+    '''
+    if len(edge_list):
+        nodes, edges = intern_nodes(np.reshape(np.asarray(edge_list, dtype=str)[:, :2], (-1, 2)), nodes)
+    else:
+        nodes, edges = list(nodes) if nodes is not None else [], np.zeros((0, 2), dtype=np.int64)
+    return nodes, adjacency_matrix(edges, len(nodes))
+
+def restrict_graph(nodes, A, new_nodes, node_to_index=None):
+    '''
+    Map a graph onto new nodes, omitting edges with nodes that are not in
+    new_nodes.  Return the adjacency matrix of the graph on new_nodes.
+    '''
+    _, ids = intern_nodes(nodes, new_nodes, node_to_index)
+    B = A.tocoo()
+    return adjacency_matrix(np.column_stack((ids[B.row], ids[B.col])), len(new_nodes))
+
+def load_graph_file(filename, nodes=None, node_to_index=None):
+    '''
+    Load a graph from an edge list file through the cache.  If nodes is given,
+    then the graph has these nodes and omits edges with other nodes; see
+    intern_nodes for node_to_index.  Return the nodes and the CSR adjacency
+    matrix.
+    '''
+    from common import parse_edge_list, decode_strings
+
+    def parse(filename):
+        # Intern the nodes as bytes and decode only the distinct nodes.
+        sources, targets = parse_edge_list(filename, decode=False)
+        if not np.size(sources):
+            raise Exception('Edge list has no edges; check {}.'.format(filename))
+
+        graph_nodes, edges = np.unique(np.column_stack((sources, targets)), return_inverse=True)
+        A = adjacency_matrix(edges, len(graph_nodes))
+        return {'nodes': decode_strings(graph_nodes), 'indptr': A.indptr, 'indices': A.indices}
+
+    with stage('load_network', filename=filename) as info:
+        arrays = load_cached_arrays(filename, 'graph', parse)
+        graph_nodes = arrays['nodes']
+        A = sp.sparse.csr_matrix((np.ones(len(arrays['indices']), dtype=np.int8), arrays['indices'], arrays['indptr']), shape=(len(graph_nodes), len(graph_nodes)))
+
+        if nodes is not None:
+            graph_nodes, A = nodes, restrict_graph(graph_nodes, A, nodes, node_to_index)
+
+        if enabled():
+            info.update(graph_summary(A))
+
+    return list(graph_nodes), A
+
+def initialize_graph_worker(function, graphs, args):
+    global worker_function, worker_graphs, worker_args
+    worker_function = function
+    worker_graphs = graphs
+    worker_args = args
+
+def call_graph_worker(task):
+    i, num_cores = task
+    name, A = worker_graphs[i]
+    return worker_function(name, A, num_cores, *worker_args)
+
+def map_graphs(function, graphs, num_cores=1, args=()):
+    '''
+    Call function(name, A, num_cores, *args) on each pair of a name and an
+    adjacency matrix in graphs, where num_cores is the number of cores for that
+    graph.  With several graphs and cores, the graphs are processed at once: if
+    there are at least two cores per graph, then each graph gets its share of
+    the cores in its own thread, and otherwise each graph gets one core in a
+    pool of processes, so function must be defined at the top level of a
+    module.  Return the list of results in the order of the graphs.
+    '''
+    num_graphs = len(graphs)
+
+    if num_cores==1 or num_graphs<=1:
+        initialize_graph_worker(function, graphs, args)
+        return [call_graph_worker((i, num_cores)) for i in range(num_graphs)]
+    elif num_cores>=2*num_graphs:
+        from multiprocessing.pool import ThreadPool
+        initialize_graph_worker(function, graphs, args)
+        pool = ThreadPool(num_graphs)
+        results = pool.map(call_graph_worker, [(i, num_cores//num_graphs) for i in range(num_graphs)])
+    else:
+        import multiprocessing
+        pool = multiprocessing.Pool(min(num_cores, num_graphs), initialize_graph_worker, (function, graphs, args))
+        results = pool.map(call_graph_worker, [(i, 1) for i in range(num_graphs)])
+    pool.close()
+    pool.join()
+    return results
+
+def map_graph_files(function, filenames, nodes, num_cores=1, args=()):
+    '''
+    Load the graph of each edge list file on the given nodes, which are indexed
+    only once for all of the graphs, and call function on the graphs as in
+    map_graphs.
+    '''
+    node_to_index = node_index(nodes)
+    graphs = [(filename, load_graph_file(filename, nodes, node_to_index)[1]) for filename in filenames]
+    return map_graphs(function, graphs, num_cores, args)
+
+def degrees(A):
+    return np.diff(A.indptr)
+
+def neighbors(A, i):
+    return A.indices[A.indptr[i]:A.indptr[i+1]]
+
+def induced_subgraph(A, indices):
+    '''
+    Return the adjacency matrix of the subgraph induced by the given node ids or
+    boolean mask; node i of the subgraph is indices[i].
+    '''
+    indices = np.flatnonzero(indices) if np.asarray(indices).dtype==bool else np.asarray(indices)
+    return A[indices][:, indices]
+
+def connected_components(A, indices=None):
+    '''
+    Label the connected components of the graph or of the subgraph induced by
+    the given node ids or boolean mask; nodes outside the subgraph have label
+    -1.
+    '''
+    n = A.shape[0]
+    if indices is None:
+        _, labels = sp.sparse.csgraph.connected_components(A, directed=False)
+        return labels
+    else:
+        indices = np.flatnonzero(indices) if np.asarray(indices).dtype==bool else np.asarray(indices)
+        labels = -np.ones(n, dtype=np.int64)
+        if np.size(indices):
+            _, labels[indices] = sp.sparse.csgraph.connected_components(induced_subgraph(A, indices), directed=False)
+        return labels
+
+def nonsingleton_components(A, indices=None):
+    '''
+    Return a boolean mask of the nodes in nonsingleton connected components of
+    the graph or of the subgraph induced by the given node ids or boolean mask.
+    '''
+    labels = connected_components(A, indices)
+    sizes = np.bincount(labels[labels>=0], minlength=1)
+    return (labels>=0) & (sizes[np.maximum(labels, 0)]>1)
+
+def graph_summary(A, indices=None):
+    '''
+    Count the nodes, edges, and connected components of the graph or of the
+    subgraph induced by the given node ids or boolean mask.
+    '''
+    B = A if indices is None else induced_subgraph(A, indices)
+    labels = connected_components(B)
+    return {'num_nodes': B.shape[0], 'num_edges': B.nnz//2, 'num_components': len(np.unique(labels)), 'num_isolated_nodes': int(np.sum(degrees(B)==0))}
@@ -0,0 +1,431 @@
+#!/usr/bin/python
+
+import numpy as np, scipy as sp, scipy.sparse, scipy.sparse.csgraph
+import multiprocessing, time
+
+from graph import adjacency_matrix, connected_components, degrees, induced_subgraph
+
+################################################################################
+#
+# Maximum-weight connected subgraph (MWCS) functions
+#
+################################################################################
+
+def subgraph_weight(weights, subgraph):
+    return float(np.sum(weights[list(subgraph)])) if len(subgraph) else 0.0
+
+def positive_clusters(A, weights):
+    '''
+    Label the connected components of the subgraph induced by the nodes with
+    positive weight; nodes with nonpositive weights have label -1.
+    '''
+    return connected_components(A, weights>0)
+
+def grow(A, costs, labels, cluster_weights, subgraph):
+    '''
+    Greedily add the cluster of positive nodes with the largest gain, i.e., the
+    weight of the cluster minus the cost of the cheapest path to it, until no
+    cluster has positive gain.
+    '''
+    subgraph = set(subgraph)
+    num_clusters = len(cluster_weights)
+    positive_indices = np.flatnonzero(labels>=0)
+
+    # Entering a node costs the negative part of its weight; scipy treats
+    # explicit zeros as missing edges, so every cost is slightly positive.
+    C = A.astype(np.float64)
+    C.data = costs[C.indices]+1e-9
+
+    while True:
+        included = np.zeros(num_clusters, dtype=bool)
+        included[np.unique(labels[[i for i in subgraph if labels[i]>=0]])] = True
+        if np.all(included):
+            break
+
+        distances, predecessors, _ = sp.sparse.csgraph.dijkstra(C, indices=sorted(subgraph), return_predecessors=True, min_only=True)
+
+        cluster_distances = np.full(num_clusters, np.inf)
+        np.minimum.at(cluster_distances, labels[positive_indices], distances[positive_indices])
+        gains = np.where(included, -np.inf, cluster_weights-cluster_distances)
+
+        c = np.argmax(gains)
+        if not gains[c]>0:
+            break
+
+        # Add cheapest path to cluster, the cluster, and any clusters on the path.
+        cluster_indices = positive_indices[labels[positive_indices]==c]
+        i = cluster_indices[np.argmin(distances[cluster_indices])]
+        added_clusters = set([c])
+        while i>=0 and i not in subgraph:
+            subgraph.add(i)
+            if labels[i]>=0:
+                added_clusters.add(labels[i])
+            i = predecessors[i]
+        for c in added_clusters:
+            subgraph.update(positive_indices[labels[positive_indices]==c])
+
+    return subgraph
+
+def prune(A, weights, subgraph, random_state=None):
+    '''
+    Find the maximum-weight subtree of a spanning tree of the given connected
+    subgraph; the spanning tree is random if a random state is given.
+    '''
+    if len(subgraph)<=1:
+        return set(subgraph)
+
+    indices = np.array(sorted(subgraph))
+    B = induced_subgraph(A, indices).astype(np.float64)
+    if random_state is not None:
+        B.data = random_state.uniform(1.0, 2.0, len(B.data))
+        B = B.maximum(B.T)
+    T = sp.sparse.csgraph.minimum_spanning_tree(B)
+    T = T+T.T
+
+    root = 0 if random_state is None else random_state.randint(len(indices))
+    order, predecessors = sp.sparse.csgraph.breadth_first_order(T, root, directed=False, return_predecessors=True)
+
+    # Compute the weight of the best subtree rooted at each node in reverse
+    # breadth-first order.
+    values = weights[indices].astype(np.float64)
+    for i in order[::-1]:
+        j = predecessors[i]
+        if j>=0 and values[i]>0:
+            values[j] += values[i]
+
+    # Reconstruct the best subtree from its root.
+    children = dict()
+    for i in order[1:]:
+        children.setdefault(predecessors[i], list()).append(i)
+
+    best_root = order[np.argmax(values[order])]
+    pruned_subgraph = set()
+    queue = [best_root]
+    while queue:
+        i = queue.pop()
+        pruned_subgraph.add(indices[i])
+        queue.extend(j for j in children.get(i, []) if values[j]>0)
+
+    return pruned_subgraph
+
+def local_search(A, weights, labels, cluster_weights, subgraph, random_state, max_num_iter=100, deadline=None, perturbation=0.5):
+    '''
+    Improve a solution by perturbing node costs, growing the current solution
+    with the perturbed costs, and pruning the result with a random spanning
+    tree; keep the result if its weight increases.
+    '''
+    costs = np.maximum(-weights, 0.0)
+    best_subgraph = set(subgraph)
+    best_weight = subgraph_weight(weights, best_subgraph)
+
+    for _ in range(max_num_iter):
+        if deadline is not None and time.time()>=deadline:
+            break
+
+        perturbed_costs = costs*random_state.uniform(1.0-perturbation, 1.0+perturbation, len(costs))
+        candidate_subgraph = grow(A, perturbed_costs, labels, cluster_weights, best_subgraph)
+        candidate_subgraph = prune(A, weights, candidate_subgraph, random_state)
+        candidate_weight = subgraph_weight(weights, candidate_subgraph)
+
+        if candidate_weight>best_weight:
+            best_subgraph, best_weight = candidate_subgraph, candidate_weight
+
+    return best_subgraph
+
+def initialize_worker(A, weights, labels=None):
+    global worker_A, worker_weights, worker_labels, worker_cluster_weights
+    worker_A = A
+    worker_weights = weights
+    worker_labels = positive_clusters(A, weights) if labels is None else labels
+    worker_cluster_weights = np.bincount(worker_labels[worker_labels>=0], weights[worker_labels>=0])
+
+def solve_from_cluster(task):
+    '''
+    Grow and prune a solution from a cluster of positive nodes, and then improve
+    it with local search.
+    '''
+    cluster, seed, max_num_iter, deadline = task
+    random_state = np.random.RandomState(seed)
+
+    subgraph = set(np.flatnonzero(worker_labels==cluster))
+    subgraph = grow(worker_A, np.maximum(-worker_weights, 0.0), worker_labels, worker_cluster_weights, subgraph)
+    subgraph = prune(worker_A, worker_weights, subgraph)
+    subgraph = local_search(worker_A, worker_weights, worker_labels, worker_cluster_weights, subgraph, random_state, max_num_iter, deadline)
+
+    return sorted(subgraph), subgraph_weight(worker_weights, subgraph)
+
+def mwcs(weights, A, num_cores=1, time_limit=None, max_num_iter=100, num_starts=None, seed=0):
+    '''
+    Find a maximum-weight connected subgraph of the graph with adjacency matrix
+    A heuristically, and return a boolean mask of its nodes.  Local search
+    starts from the clusters of positive nodes with the largest weights and
+    runs on num_cores processes for at most max_num_iter iterations and
+    time_limit seconds per start.
+    '''
+
+    # Exclude nodes that are not in the network.
+    weights = np.where(degrees(A)>0, weights, -np.inf)
+    deadline = time.time()+time_limit if time_limit is not None else None
+
+    labels = positive_clusters(A, weights)
+    cluster_weights = np.bincount(labels[labels>=0], weights[labels>=0])
+    if not len(cluster_weights):
+        return np.zeros(len(weights), dtype=bool)
+
+    if num_starts is None:
+        num_starts = num_cores
+    clusters = np.argsort(-cluster_weights)[:num_starts]
+    tasks = [(cluster, (seed, i), max_num_iter, deadline) for i, cluster in enumerate(clusters)]
+
+    # The clusters are found here rather than in initialize_worker so that
+    # several graphs can be solved at once from threads.
+    if num_cores==1:
+        initialize_worker(A, weights, labels)
+        results = list(map(solve_from_cluster, tasks))
+    else:
+        pool = multiprocessing.Pool(min(num_cores, len(tasks)), initialize_worker, (A, weights, labels))
+        results = pool.map(solve_from_cluster, tasks)
+        pool.close()
+        pool.join()
+
+    best_subgraph, _ = max(results, key=lambda result: result[1])
+    in_subgraph = np.zeros(len(weights), dtype=bool)
+    in_subgraph[best_subgraph] = True
+    return in_subgraph
+
+def initialize_component_worker(weights, A, time_limit, max_num_iter, num_starts, seed):
+    global worker_component_weights, worker_component_A, worker_component_parameters
+    worker_component_weights = weights
+    worker_component_A = A
+    worker_component_parameters = (time_limit, max_num_iter, num_starts, seed)
+
+def solve_component(task):
+    '''
+    Solve the MWCS instance of one connected component.  Return the nodes of
+    the solution and its weight.
+    '''
+    indices, num_cores = task
+    time_limit, max_num_iter, num_starts, seed = worker_component_parameters
+    weights = worker_component_weights[indices]
+    in_subgraph = mwcs(weights, induced_subgraph(worker_component_A, indices), num_cores, time_limit, max_num_iter, num_starts, seed)
+    return indices[in_subgraph], float(np.sum(weights[in_subgraph]))
+
+def decomposed_mwcs(weights, A, num_cores=1, time_limit=None, max_num_iter=100, num_starts=None, seed=0):
+    '''
+    Find a maximum-weight connected subgraph by reducing the instance, splitting
+    the reduced instance into its connected components, solving the components
+    on a pool of num_cores processes from the largest to the smallest, and
+    keeping the heaviest solution; see mwcs for the other arguments, which
+    apply to each component.  A single component is solved with all of the
+    cores.  Return a boolean mask of the nodes.
+    '''
+    reduced_weights, reduced_A, mapping = reduce_mwcs(weights, A)
+    if not len(reduced_weights):
+        return np.zeros(len(weights), dtype=bool)
+    if num_starts is None:
+        num_starts = num_cores
+
+    # A component cannot hold a better solution than its total positive weight.
+    labels = connected_components(reduced_A)
+    upper_bounds = np.bincount(labels, np.maximum(reduced_weights, 0.0))
+    sizes = np.bincount(labels)
+    order = np.argsort(labels, kind='stable')
+    components = np.split(order, np.cumsum(sizes)[:-1])
+    components = [components[c] for c in np.argsort(-sizes, kind='stable') if upper_bounds[c]>=np.max(reduced_weights)]
+
+    if num_cores==1 or len(components)==1:
+        initialize_component_worker(reduced_weights, reduced_A, time_limit, max_num_iter, num_starts, seed)
+        results = [solve_component((indices, num_cores)) for indices in components]
+    else:
+        pool = multiprocessing.Pool(min(num_cores, len(components)), initialize_component_worker, (reduced_weights, reduced_A, time_limit, max_num_iter, num_starts, seed))
+        results = pool.map(solve_component, [(indices, 1) for indices in components], chunksize=1)
+        pool.close()
+        pool.join()
+
+    best_subgraph, _ = max(results, key=lambda result: result[1])
+    in_reduced_subgraph = np.zeros(len(reduced_weights), dtype=bool)
+    in_reduced_subgraph[best_subgraph] = True
+    return expand_mwcs_solution(in_reduced_subgraph, mapping)
+
+################################################################################
+#
+# MWCS reduction functions
+#
+################################################################################
+
+# Each reduction maps the nodes of the current instance to the nodes of a
+# smaller instance with the same maximum weight, or to -1 for removed nodes;
+# the mappings are composed, so that a solution of the reduced instance expands
+# to a solution of the original instance with the same weight.
+
+def contract_nodes(weights, A, mapping):
+    '''
+    Contract or remove nodes by mapping; nodes mapped to the same id are
+    merged, and their weights are summed.  Return the new weights and
+    adjacency matrix.
+    '''
+    num_nodes = np.max(mapping)+1 if np.size(mapping) else 0
+    kept = mapping>=0
+    new_weights = np.bincount(mapping[kept], weights[kept], minlength=num_nodes)
+    B = A.tocoo()
+    new_A = adjacency_matrix(np.column_stack((mapping[B.row], mapping[B.col])), num_nodes)
+    return new_weights, new_A
+
+def renumber(kept):
+    '''
+    Map the nodes in the boolean mask kept to 0, 1, ... and the other nodes to
+    -1.
+    '''
+    mapping = -np.ones(len(kept), dtype=np.int64)
+    mapping[kept] = np.arange(np.sum(kept))
+    return mapping
+
+def contract_positive_clusters(weights, A):
+    '''
+    Merge each connected cluster of positive nodes into one node, since an
+    optimal solution with a positive node also has its positive neighbors.
+    '''
+    labels = positive_clusters(A, weights)
+    num_clusters = np.max(labels)+1 if np.size(labels) else 0
+    mapping = np.where(labels>=0, labels, -1)
+    mapping[labels<0] = num_clusters+np.arange(np.sum(labels<0))
+    return mapping
+
+def remove_dominated_components(weights, A):
+    '''
+    Remove the connected components whose total positive weight is less than
+    the largest weight of a node, which is a lower bound on the maximum weight.
+    '''
+    labels = connected_components(A)
+    upper_bounds = np.bincount(labels, np.maximum(weights, 0.0))
+    return renumber(upper_bounds[labels]>=np.max(weights))
+
+def remove_nonpositive_leaves(weights, A):
+    '''
+    Repeatedly remove the nonpositive nodes with at most one neighbor, since
+    removing them from a solution keeps it connected and does not decrease its
+    weight.
+    '''
+    indptr, indices = A.indptr.tolist(), A.indices.tolist()
+    node_degrees = degrees(A).tolist()
+    nonpositive = (weights<=0).tolist()
+
+    kept = [True]*len(node_degrees)
+    queue = [i for i in range(len(node_degrees)) if nonpositive[i] and node_degrees[i]<=1]
+    while queue:
+        i = queue.pop()
+        if not kept[i]:
+            continue
+        kept[i] = False
+        for j in indices[indptr[i]:indptr[i+1]]:
+            if kept[j]:
+                node_degrees[j] -= 1
+                if nonpositive[j] and node_degrees[j]<=1:
+                    queue.append(j)
+
+    return renumber(np.array(kept, dtype=bool))
+
+def contract_nonpositive_chains(weights, A):
+    '''
+    Merge each path of nonpositive nodes with two neighbors into one node,
+    since a solution has either all or, after removing nonpositive leaves, none
+    of its nodes.  Remove paths that start and end at the same node or whose
+    ends are also joined by an edge or by a heavier path.
+    '''
+    n = len(weights)
+    in_chain = (weights<=0) & (degrees(A)==2)
+    if not np.any(in_chain):
+        return np.arange(n)
+    labels = connected_components(A, in_chain)
+    num_chains = np.max(labels)+1
+
+    # Find the two nodes at the ends of each path.
+    B = A.tocoo()
+    exits = in_chain[B.row] & ~in_chain[B.col]
+    chains, ends = labels[B.row[exits]], B.col[exits]
+    order = np.argsort(chains, kind='stable')
+    chains, ends = chains[order], ends[order]
+    num_ends = np.bincount(chains, minlength=num_chains)
+
+    chain_weights = np.bincount(labels[in_chain], weights[in_chain], minlength=num_chains)
+    removed = num_ends!=2
+    starts = np.concatenate(([0], np.cumsum(num_ends)[:-1]))
+    paired = np.flatnonzero(~removed)
+    u = np.minimum(ends[starts[paired]], ends[starts[paired]+1])
+    v = np.maximum(ends[starts[paired]], ends[starts[paired]+1])
+
+    # Remove loops, paths parallel to an edge, and all but the heaviest of
+    # parallel paths.
+    removed[paired[u==v]] = True
+    if len(paired):
+        removed[paired[np.asarray(A[u, v]).ravel()>0]] = True
+    order = np.lexsort((-chain_weights[paired], v, u))
+    duplicate = np.zeros(len(paired), dtype=bool)
+    duplicate[order[1:]] = (u[order[1:]]==u[order[:-1]]) & (v[order[1:]]==v[order[:-1]])
+    removed[paired[duplicate]] = True
+
+    mapping = np.arange(n)
+    mapping[in_chain] = n+labels[in_chain]
+    mapping[in_chain & removed[np.maximum(labels, 0)]] = -1
+    kept = np.zeros(n+num_chains, dtype=bool)
+    kept[mapping[mapping>=0]] = True
+    return np.where(mapping>=0, renumber(kept)[np.maximum(mapping, 0)], -1)
+
+def reduce_mwcs(weights, A):
+    '''
+    Reduce an MWCS instance by contracting clusters of positive nodes and paths
+    of nonpositive nodes and by removing nonpositive leaves and components that
+    cannot contain an optimal solution, until no reduction applies.  Nodes
+    without neighbors are not in the network and are removed.  Return the
+    reduced weights, the reduced adjacency matrix, and the id of the reduced
+    node of each node, which is -1 for removed nodes.
+    '''
+    weights = np.asarray(weights, dtype=np.float64)
+    n = len(weights)
+
+    in_network = degrees(A)>0
+    if not np.any(in_network & (weights>0)):
+        mapping = renumber(in_network)
+        return weights[in_network], induced_subgraph(A, in_network), mapping
+
+    mapping = renumber(in_network)
+    reduced_weights, reduced_A = contract_nodes(weights, A, mapping)
+    reductions = [contract_positive_clusters, remove_dominated_components, remove_nonpositive_leaves, contract_nonpositive_chains]
+
+    while True:
+        num_nodes, num_edges = len(reduced_weights), reduced_A.nnz
+        for reduction in reductions:
+            step = reduction(reduced_weights, reduced_A)
+            reduced_weights, reduced_A = contract_nodes(reduced_weights, reduced_A, step)
+            mapping = np.where(mapping>=0, step[np.maximum(mapping, 0)], -1)
+        if len(reduced_weights)==num_nodes and reduced_A.nnz==num_edges:
+            break
+
+    # An edge list cannot hold a node without neighbors, so add back one
+    # removed neighbor of each such node as a nonpositive leaf or, if it has
+    # none, split one node off of it.
+    reduced_degrees = degrees(reduced_A)
+    if np.any(reduced_degrees==0):
+        num_nodes = len(reduced_weights)
+        B = A.tocoo()
+        candidates = (mapping[B.row]>=0) & (mapping[B.col]<0)
+        candidates[candidates] = reduced_degrees[mapping[B.row[candidates]]]==0
+        attached, first = np.unique(mapping[B.row[candidates]], return_index=True)
+        leaves = np.unique(B.col[candidates][first])
+        mapping[leaves] = num_nodes+np.arange(len(leaves))
+        num_nodes += len(leaves)
+
+        for r in np.setdiff1d(np.flatnonzero(reduced_degrees==0), attached):
+            mapping[np.flatnonzero(mapping==r)[0]] = num_nodes
+            num_nodes += 1
+        reduced_weights, reduced_A = contract_nodes(weights, A, mapping)
+
+    return reduced_weights, reduced_A, mapping
+
+def expand_mwcs_solution(in_reduced_subgraph, mapping):
+    '''
+    Expand a boolean mask of the nodes of a reduced MWCS instance to a boolean
+    mask of the nodes of the original instance.
+    '''
+    in_reduced_subgraph = np.asarray(in_reduced_subgraph, dtype=bool)
+    return (mapping>=0) & in_reduced_subgraph[np.maximum(mapping, 0)]
@@ -0,0 +1,162 @@
+#!/usr/bin/python
+
+# Load packages.
+import os, sys, argparse, collections, contextlib, shlex, time
+
+# Each subcommand runs the get_parser and run functions of its script, which is
+# imported only when the subcommand runs, so that, e.g., heinz-parse does not
+# import numpy or scipy.
+subcommands = collections.OrderedDict([
+    ('scores', 'compute_scores'),
+    ('positive-subset', 'compute_positive_subset'),
+    ('mwcs-subset', 'compute_mwcs_subset'),
+    ('scan-subset', 'compute_scan_statistic_subset'),
+    ('reduce-mwcs', 'reduce_mwcs_instance'),
+    ('heinz-parse', 'process_heinz_output'),
+    ('generate', collections.OrderedDict([
+        ('ba-graph', 'generate_barabasi_albert_graph'),
+        ('er-graph', 'generate_erdos_renyi_graph'),
+        ('vertex-weights', 'generate_vertex_weights'),
+    ])),
+    ('significance', 'evaluate_statistical_significance'),
+    ('metrics', 'compute_metrics'),
+    ('run', 'run_netmix'),
+    ('solver-jobs', 'run_solver_jobs'),
+    ('simulation-sweep', 'run_simulation_sweep'),
+])
+
+# Maximum number of seconds from starting Python to parsing the arguments of
+# each subcommand; see benchmark_startup.py.
+startup_budgets = {
+    'scores': 0.75,
+    'positive-subset': 0.75,
+    'mwcs-subset': 0.75,
+    'scan-subset': 0.75,
+    'reduce-mwcs': 0.75,
+    'heinz-parse': 0.1,
+    'generate ba-graph': 0.75,
+    'generate er-graph': 0.75,
+    'generate vertex-weights': 0.75,
+    'significance': 0.75,
+    'metrics': 0.75,
+    'run': 0.75,
+    'solver-jobs': 0.25,
+    'simulation-sweep': 0.75,
+    'batch': 0.1,
+}
+
+# Parse arguments.
+def get_parser():
+    parser = argparse.ArgumentParser(prog='netmix', description='Run a NetMix subcommand, or run a batch of subcommands from a jobs file in one process.')
+    parser.add_argument('subcommand', type=str, choices=list(subcommands)+['batch'], help='Subcommand; see netmix SUBCOMMAND -h')
+    parser.add_argument('arguments', nargs=argparse.REMAINDER, help='Arguments of the subcommand')
+    return parser
+
+def get_batch_parser():
+    parser = argparse.ArgumentParser(prog='netmix batch', description='Run the subcommands listed in a jobs file, one per line with its arguments, e.g., "positive-subset -i scores.tsv -elf network.tsv -o subnetwork.txt".')
+    parser.add_argument('-j', '--jobs_file', type=str, required=True, help='Jobs file; lines starting with # are ignored')
+    parser.add_argument('-k', '--keep_going', action='store_true', help='Run the other jobs after a job fails')
+    parser.add_argument('--profile', type=str, required=False, help='Append telemetry to this JSON-lines trace file')
+    return parser
+
+# Define functions.
+def resolve_subcommand(subcommand, arguments):
+    '''
+    Return the name and the module of a subcommand and its remaining
+    arguments, e.g., ('generate ba-graph', 'generate_barabasi_albert_graph', [...])
+    for generate ba-graph.
+    '''
+    if subcommand not in subcommands:
+        raise ValueError('{} is not a subcommand; choose from {}.'.format(subcommand, ', '.join(list(subcommands)+['batch'])))
+    module_name = subcommands[subcommand]
+    if isinstance(module_name, dict):
+        if not arguments or arguments[0] not in module_name:
+            raise ValueError('{} needs one of {}.'.format(subcommand, ', '.join(module_name)))
+        return '{} {}'.format(subcommand, arguments[0]), module_name[arguments[0]], arguments[1:]
+    return subcommand, module_name, arguments
+
+def run_subcommand(subcommand, arguments):
+    '''
+    Import the script of a subcommand and run it with the given arguments.
+    '''
+    import importlib
+
+    name, module_name, arguments = resolve_subcommand(subcommand, arguments)
+    module = importlib.import_module(module_name)
+    parser = module.get_parser()
+    parser.prog = 'netmix {}'.format(name)
+    module.run(parser.parse_args(arguments))
+
+def load_batch_jobs(filename):
+    '''
+    Load the jobs of a jobs file as lists of a subcommand and its arguments.
+    '''
+    jobs = list()
+    with open(filename, 'r') as f:
+        for line in f:
+            if line.strip() and not line.lstrip().startswith('#'):
+                arrs = shlex.split(line)
+                if arrs[0]=='netmix':
+                    arrs = arrs[1:]
+                jobs.append(arrs)
+    return jobs
+
+@contextlib.contextmanager
+def restored_environment():
+    '''
+    Restore the environment variables after a job, e.g., NETMIX_PROFILE, which
+    a job sets with --profile, so that they do not leak into later jobs.
+    '''
+    environment = dict(os.environ)
+    try:
+        yield
+    finally:
+        os.environ.clear()
+        os.environ.update(environment)
+
+def run_batch(jobs, keep_going=False):
+    '''
+    Run each job in this process, so that Python and each script start only
+    once.  Report each job that fails to standard error.  Return the number
+    of failed jobs.
+    '''
+    from telemetry import record
+
+    num_failed = 0
+    for i, job in enumerate(jobs):
+        start = time.time()
+        try:
+            with restored_environment():
+                run_subcommand(job[0], job[1:])
+            status = 'done'
+        except SystemExit as e:
+            status = 'done' if not e.code else 'failed'
+        except Exception as e:
+            sys.stderr.write('Job {} ({}) failed: {}\n'.format(i+1, ' '.join(job), e))
+            status = 'failed'
+        record('batch_job', job=job, status=status, wall_time=time.time()-start)
+
+        if status=='failed':
+            num_failed += 1
+            if not keep_going:
+                break
+    return num_failed
+
+# Run script.
+def run(args):
+    if args.subcommand=='batch':
+        from telemetry import start_trace
+
+        batch_args = get_batch_parser().parse_args(args.arguments)
+        start_trace(batch_args.profile)
+        if run_batch(load_batch_jobs(batch_args.jobs_file), batch_args.keep_going):
+            sys.exit(1)
+    else:
+        try:
+            resolve_subcommand(args.subcommand, args.arguments)
+        except ValueError as e:
+            get_parser().error(str(e))
+        run_subcommand(args.subcommand, args.arguments)
+
+if __name__=='__main__':
+    run(get_parser().parse_args(sys.argv[1:]))
@@ -1,20 +1,24 @@
 #!/usr/bin/python
 
 # Load packages.
-import math
-import os, sys, argparse
+import sys, argparse
+
+from fileio import open_file, write_lines
+from telemetry import start_trace
 
 # Parse arguments.
 def get_parser():
     parser = argparse.ArgumentParser()
     parser.add_argument('-i', '--input_file', type=str, required=True)
     parser.add_argument('-o', '--output_file', type=str, required=True)
+    parser.add_argument('-mf', '--mapping_file', type=str, required=False, help='Mapping file from reduce_mwcs_instance.py; expand each reduced node to its nodes')
+    parser.add_argument('--profile', type=str, required=False, help='Append telemetry to this JSON-lines trace file')
     return parser
 
 # Define functions.
 def load_heinz_results(filename):
     node_to_score = dict()
-    with open(filename, 'r') as f:
+    with open_file(filename, 'r') as f:
         for l in f:
             if not l.startswith('#'):
                 arrs = l.rstrip('\n').split('\t')
@@ -28,10 +32,17 @@ def load_heinz_results(filename):
 
 # Run script.
 def run(args):
+    start_trace(args.profile)
+
     heinz_results = load_heinz_results(args.input_file)
 
-    with open(args.output_file, 'w') as f:
-        f.write('\n'.join(sorted(heinz_results)))
+    if args.mapping_file is not None:
+        from reduce_mwcs_instance import load_mapping
+        reduced_node_to_nodes = load_mapping(args.mapping_file)
+        heinz_results = [node for reduced_node in heinz_results for node in reduced_node_to_nodes[reduced_node]]
+
+    with open_file(args.output_file, 'w') as f:
+        write_lines(f, sorted(heinz_results))
 
 if __name__=='__main__':
     run(get_parser().parse_args(sys.argv[1:]))
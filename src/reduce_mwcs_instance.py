@@ -0,0 +1,69 @@
+#!/usr/bin/python
+
+# Load packages.
+import numpy as np
+import sys, argparse
+
+from common import load_node_score_arrays, open_file, save_node_score, save_edge_list, write_lines
+from graph import load_graph_file, degrees
+from mwcs import reduce_mwcs
+from telemetry import start_trace, stage
+
+# Parse arguments.
+def get_parser():
+    parser = argparse.ArgumentParser(description='Reduce an MWCS instance before running a solver, e.g., heinz, on it.')
+    parser.add_argument('-i', '--input_file', type=str, required=True, help='Score file')
+    parser.add_argument('-elf', '--edge_list_file', type=str, required=True, help='Edge list file')
+    parser.add_argument('-o', '--output_file', type=str, required=True, help='Reduced score file')
+    parser.add_argument('-oelf', '--output_edge_list_file', type=str, required=True, help='Reduced edge list file')
+    parser.add_argument('-mf', '--mapping_file', type=str, required=True, help='Output file mapping each reduced node to its nodes; see process_heinz_output.py')
+    parser.add_argument('--profile', type=str, required=False, help='Append telemetry to this JSON-lines trace file')
+    return parser
+
+# Define functions.
+def reduced_node_names(nodes, weights, mapping):
+    '''
+    Name each reduced node after its node with the largest weight.
+    '''
+    kept = np.flatnonzero(mapping>=0)
+    order = kept[np.lexsort((-weights[kept], mapping[kept]))]
+    _, first = np.unique(mapping[order], return_index=True)
+    return [nodes[i] for i in order[first]]
+
+def save_mapping(filename, nodes, reduced_nodes, mapping):
+    with open_file(filename, 'w') as f:
+        write_lines(f, ('{}\t{}'.format(reduced_nodes[mapping[i]], nodes[i]) for i in np.flatnonzero(mapping>=0)))
+
+def load_mapping(filename):
+    '''
+    Load a mapping file as a dictionary from each reduced node to its nodes.
+    '''
+    reduced_node_to_nodes = dict()
+    with open_file(filename, 'r') as f:
+        for l in f:
+            arrs = l.rstrip('\n').split('\t')
+            if len(arrs)==2:
+                reduced_node_to_nodes.setdefault(arrs[0], list()).append(arrs[1])
+    return reduced_node_to_nodes
+
+# Run script.
+def run(args):
+    start_trace(args.profile)
+
+    nodes, scores = load_node_score_arrays(args.input_file)
+    _, A = load_graph_file(args.edge_list_file, nodes)
+
+    with stage('reduce_mwcs', num_nodes=int(np.sum(degrees(A)>0)), num_edges=A.nnz//2) as info:
+        reduced_scores, reduced_A, mapping = reduce_mwcs(scores, A)
+        info.update(num_reduced_nodes=len(reduced_scores), num_reduced_edges=reduced_A.nnz//2)
+
+    reduced_nodes = reduced_node_names(nodes, np.asarray(scores), mapping)
+    B = reduced_A.tocoo()
+    upper = B.row<B.col
+
+    save_node_score(args.output_file, dict(zip(reduced_nodes, reduced_scores)))
+    save_edge_list(args.output_edge_list_file, [(reduced_nodes[i], reduced_nodes[j]) for i, j in zip(B.row[upper], B.col[upper])])
+    save_mapping(args.mapping_file, nodes, reduced_nodes, mapping)
+
+if __name__=='__main__':
+    run(get_parser().parse_args(sys.argv[1:]))
@@ -0,0 +1,173 @@
+#!/usr/bin/python
+
+# Load packages.
+import numpy as np
+import os, sys, argparse, collections, shutil, subprocess, tempfile, time
+
+from common import cached_em, load_node_score_arrays, save_node_score, save_nodes
+from compute_scores import transform_scores, compute_scores
+from compute_positive_subset import compute_positive_subset
+from graph import load_graph_file, restrict_graph, graph_summary, node_index, map_graphs
+from mwcs import mwcs
+from telemetry import enabled, record, start_trace
+
+# Parse arguments.
+def get_parser():
+    parser = argparse.ArgumentParser(description='Run NetMix on one or more networks.')
+    parser.add_argument('-elf', '--edge_list_file', type=str, nargs='+', required=True, help='Edge list files')
+    parser.add_argument('-i', '--input_file', type=str, required=True, help='Input score file')
+    parser.add_argument('-z', '--z_scores', action='store_true', help='Input score file already contains z-scores')
+    parser.add_argument('-sc', '--score_choice', type=str, choices=['r', 'responsibility', 'responsibilities', 'llr', 'log_likelihood_ratio', 'log_likelihood_ratios', 'z', 'z-score', 'z-scores', 'z_score', 'z_scores'], default='responsibilities', help='Choose scores')
+    parser.add_argument('-tc', '--threshold_choice', type=str, choices=['mixing_proportions', 'natural', 'none'], default='mixing_proportions', help='Choose score threshold')
+    parser.add_argument('-m', '--method', type=str, choices=['mwcs', 'heinz', 'positive'], default='mwcs', help='Choose subnetwork method')
+    parser.add_argument('-hd', '--heinz_directory', type=str, required=False, help='heinz directory')
+    parser.add_argument('-nc', '--num_cores', type=int, default=1, help='Number of cores')
+    parser.add_argument('-t', '--time_limit', type=float, required=False, help='Maximum number of seconds for solver')
+    parser.add_argument('-s', '--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--refit', action='store_true', help='Fit mixture model from all starts instead of from cached parameters')
+    parser.add_argument('-o', '--output_file', type=str, nargs='+', required=True, help='Subnetwork files, one for each edge list file')
+    parser.add_argument('-sf', '--score_output_file', type=str, required=False, help='Output score file')
+    parser.add_argument('-tf', '--timing_output_file', type=str, nargs='+', required=False, help='Output files for stage timings, one for each edge list file')
+    parser.add_argument('--profile', type=str, required=False, help='Append telemetry to this JSON-lines trace file')
+    return parser
+
+# Define functions.
+NetMixResult = collections.namedtuple('NetMixResult', ['subnetwork', 'nodes', 'scores', 'mu', 'alpha', 'timings'])
+
+def run_heinz(nodes, scores, edge_list_file, heinz_directory, num_cores=1, time_limit=None):
+    '''
+    Run heinz on node scores; the scores and heinz output are handed off through
+    a temporary directory.  Return a boolean mask of the nodes in the solution.
+    '''
+    from process_heinz_output import load_heinz_results
+
+    directory = tempfile.mkdtemp(prefix='netmix-')
+    try:
+        score_file = os.path.join(directory, 'scores.tsv')
+        output_file = os.path.join(directory, 'heinz_output.tsv')
+        save_node_score(score_file, dict(zip(nodes, scores)))
+
+        command = [os.path.join(heinz_directory, 'heinz'), '-e', edge_list_file, '-n', score_file, '-o', output_file, '-m', str(num_cores), '-v', '0']
+        if time_limit is not None:
+            command += ['-t', str(int(time_limit))]
+        with open(os.devnull, 'w') as devnull:
+            subprocess.check_call(command, stdout=devnull, stderr=devnull)
+
+        subnetwork = set(load_heinz_results(output_file))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return np.array([node in subnetwork for node in nodes], dtype=bool)
+
+def find_subnetwork(network, A, num_cores, nodes, scores, method, heinz_directory, time_limit, seed, num_starts):
+    '''
+    Find the subnetwork of one network.  Return a boolean mask of the nodes in
+    the subnetwork and the time in seconds.
+    '''
+    start = time.time()
+    if method=='mwcs':
+        in_subnetwork = mwcs(scores, A, num_cores, time_limit, num_starts=num_starts, seed=seed)
+    elif method=='heinz':
+        if not isinstance(network, str) or heinz_directory is None:
+            raise ValueError('heinz requires an edge list file and the heinz directory.')
+        in_subnetwork = run_heinz(nodes, scores, network, heinz_directory, num_cores, time_limit)
+    elif method=='positive':
+        in_subnetwork = compute_positive_subset(scores, A)
+    else:
+        raise NotImplementedError('{} method not implemented'.format(method))
+    return in_subnetwork, time.time()-start
+
+def run_netmix_networks(networks, scores, z_scores=False, score_choice='responsibilities', threshold_choice='mixing_proportions', method='mwcs', heinz_directory=None, num_cores=1, time_limit=None, seed=0, refit=False):
+    '''
+    Run NetMix on several networks, fitting the mixture model and computing the
+    node scores only once and finding the subnetworks of the networks at once
+    on num_cores cores.  Each network is an edge list file or a pair of nodes
+    and an adjacency matrix; the scores are a score file or a pair of nodes and
+    an array of p-values or, if z_scores is True, z-scores.  Return a list with
+    a NetMixResult for each network with the subnetwork, node scores, mixture
+    model parameters, and the time in seconds of each stage.  The mixture
+    model is fit through the parameter cache unless refit is True.
+    '''
+    timings = collections.OrderedDict()
+
+    # Load data.
+    start = time.time()
+    if isinstance(scores, str):
+        nodes, scores = load_node_score_arrays(scores)
+    else:
+        nodes, scores = list(scores[0]), np.asarray(scores[1], dtype=np.float64)
+    timings['load_scores'] = time.time()-start
+
+    # Compute scores.
+    start = time.time()
+    if not z_scores:
+        scores = transform_scores(scores)
+    mu, alpha = cached_em(scores, refit=refit)
+    timings['em'] = time.time()-start
+
+    start = time.time()
+    scores = compute_scores(scores, mu, alpha, score_choice, threshold_choice)
+    timings['compute_scores'] = time.time()-start
+
+    # Load the networks on the same nodes, which are indexed only once.
+    node_to_index = node_index(nodes)
+    graphs, load_times = list(), list()
+    for network in networks:
+        start = time.time()
+        if isinstance(network, str):
+            _, A = load_graph_file(network, nodes, node_to_index)
+        else:
+            A = restrict_graph(network[0], network[1], nodes, node_to_index)
+        graphs.append((network if isinstance(network, str) else None, A))
+        load_times.append(time.time()-start)
+
+    # Find subnetworks; each network gets the same MWCS starts as if it were
+    # run alone.
+    subnetworks = map_graphs(find_subnetwork, graphs, num_cores, (nodes, scores, method, heinz_directory, time_limit, seed, num_cores))
+
+    results = list()
+    for (_, A), load_time, (in_subnetwork, find_time) in zip(graphs, load_times, subnetworks):
+        network_timings = collections.OrderedDict(timings)
+        network_timings['load_network'] = load_time
+        network_timings['find_subnetwork'] = find_time
+
+        if enabled():
+            record('netmix', method=method, mu=mu, alpha=alpha, timings=network_timings, subnetwork=graph_summary(A, in_subnetwork))
+
+        indices = np.flatnonzero(in_subnetwork)
+        subnetwork = [nodes[i] for i in indices[np.argsort(-scores[indices], kind='stable')]]
+        results.append(NetMixResult(subnetwork, nodes, scores, mu, alpha, network_timings))
+
+    return results
+
+def run_netmix(network, scores, z_scores=False, score_choice='responsibilities', threshold_choice='mixing_proportions', method='mwcs', heinz_directory=None, num_cores=1, time_limit=None, seed=0, refit=False):
+    '''
+    Run NetMix in a single process on one network; see run_netmix_networks.
+    Return a NetMixResult.
+    '''
+    return run_netmix_networks([network], scores, z_scores, score_choice, threshold_choice, method, heinz_directory, num_cores, time_limit, seed, refit)[0]
+
+# Run script.
+def run(args):
+    start_trace(args.profile)
+
+    for files, name in [(args.output_file, 'output'), (args.timing_output_file, 'timing output')]:
+        if files is not None and len(files)!=len(args.edge_list_file):
+            raise ValueError('Give one {} file for each edge list file.'.format(name))
+
+    results = run_netmix_networks(args.edge_list_file, args.input_file, args.z_scores, args.score_choice, args.threshold_choice, args.method,
+        args.heinz_directory, args.num_cores, args.time_limit, args.seed, args.refit)
+
+    for output_file, result in zip(args.output_file, results):
+        save_nodes(output_file, result.subnetwork)
+
+    if args.score_output_file:
+        save_node_score(args.score_output_file, dict(zip(results[0].nodes, results[0].scores)))
+
+    if args.timing_output_file:
+        for timing_output_file, result in zip(args.timing_output_file, results):
+            with open(timing_output_file, 'w') as f:
+                f.write('\n'.join('{}\t{:.6f}'.format(stage, seconds) for stage, seconds in result.timings.items()))
+
+if __name__=='__main__':
+    run(get_parser().parse_args(sys.argv[1:]))
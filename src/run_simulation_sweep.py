@@ -0,0 +1,179 @@
+#!/usr/bin/python
+
+# Load packages.
+import numpy as np
+import os, sys, argparse, itertools, multiprocessing, time
+
+from common import em_batch, compute_metrics
+from compute_scores import compute_scores
+from compute_positive_subset import compute_positive_subset
+from compute_scan_statistic_subset import connected_scan_statistic
+from generate_barabasi_albert_graph import barabasi_albert_graph
+from generate_vertex_weights import generate_vertex_weights
+from graph import adjacency_matrix
+from mwcs import mwcs
+from telemetry import start_trace, stage
+
+# Parse arguments.
+def get_parser():
+    parser = argparse.ArgumentParser(description='Run simulations over a grid of parameters.')
+    parser.add_argument('-n', type=int, nargs='+', required=True, help='Numbers of nodes')
+    parser.add_argument('-m', type=int, nargs='+', required=True, help='Parameters for Barabasi-Albert preferential attachment model')
+    parser.add_argument('-mu', type=float, nargs='+', required=True, help='Altered distribution means')
+    parser.add_argument('-alpha', type=float, nargs='+', required=True, help='Fractions of nodes drawn from altered distribution')
+    parser.add_argument('-s', '--seeds', type=int, nargs='+', default=[0], help='Random seeds, one for each replicate')
+    parser.add_argument('-me', '--methods', type=str, nargs='+', choices=['positive', 'mwcs', 'scan'], default=['positive'], help='Choose subnetwork methods')
+    parser.add_argument('-sc', '--score_choice', type=str, choices=['r', 'responsibility', 'responsibilities', 'llr', 'log_likelihood_ratio', 'log_likelihood_ratios', 'z', 'z-score', 'z-scores', 'z_score', 'z_scores'], default='responsibilities', help='Choose scores')
+    parser.add_argument('-tc', '--threshold_choice', type=str, choices=['mixing_proportions', 'natural', 'none'], default='mixing_proportions', help='Choose score threshold')
+    parser.add_argument('-t', '--time_limit', type=float, required=False, help='Maximum number of seconds for MWCS solver')
+    parser.add_argument('-nc', '--num_cores', type=int, default=1, help='Number of cores')
+    parser.add_argument('-o', '--output_file', type=str, required=True, help='Results file; finished cells are not run again')
+    parser.add_argument('--profile', type=str, required=False, help='Append telemetry to this JSON-lines trace file')
+    return parser
+
+# Define functions.
+parameter_columns = ['n', 'm', 'mu', 'alpha', 'seed', 'method']
+result_columns = ['size', 'recall', 'precision', 'f_measure', 'fdr', 'runtime']
+
+def cell_key(n, m, mu, alpha, seed, method):
+    return (int(n), int(m), float(mu), float(alpha), int(seed), str(method))
+
+def load_finished_cells(filename):
+    '''
+    Load the keys of the finished cells from a results file.  A partial last
+    line, e.g., from an interrupted run, is removed from the file.
+    '''
+    finished_cells = set()
+    if not os.path.isfile(filename):
+        return finished_cells
+
+    with open(filename, 'r+') as f:
+        data = f.read()
+        if data and not data.endswith('\n'):
+            f.seek(0)
+            f.truncate(data.rfind('\n')+1)
+            data = data[:data.rfind('\n')+1]
+
+    lines = data.splitlines()
+    if lines and lines[0].split('\t')!=parameter_columns+result_columns:
+        raise Exception('{} is not a results file.'.format(filename))
+
+    for line in lines[1:]:
+        arrs = line.split('\t')
+        if len(arrs)==len(parameter_columns)+len(result_columns):
+            finished_cells.add(cell_key(*arrs[:len(parameter_columns)]))
+    return finished_cells
+
+def simulate_graph(n, m, seed):
+    '''
+    Generate a Barabasi-Albert graph with nodes named 1, ..., n in the order of
+    the sorted names, as if the graph were loaded from its edge list file, so
+    that replicates match the file-based scripts.  Return the nodes and the
+    adjacency matrix.
+    '''
+    names = np.arange(1, n+1).astype(str)
+    order = np.argsort(names, kind='stable')
+    ranks = np.empty(n, dtype=np.int64)
+    ranks[order] = np.arange(n)
+
+    edges = barabasi_albert_graph(n, m, seed)
+    return list(names[order]), adjacency_matrix(ranks[edges], n)
+
+def find_subnetwork(method, z_scores, scores, A, time_limit=None, seed=0):
+    if method=='positive':
+        return compute_positive_subset(scores, A)
+    elif method=='mwcs':
+        return mwcs(scores, A, 1, time_limit, seed=seed)
+    elif method=='scan':
+        return connected_scan_statistic(z_scores, A)
+    else:
+        raise NotImplementedError('{} method not implemented'.format(method))
+
+def initialize_worker(score_choice, threshold_choice, time_limit):
+    global worker_score_choice, worker_threshold_choice, worker_time_limit
+    worker_score_choice = score_choice
+    worker_threshold_choice = threshold_choice
+    worker_time_limit = time_limit
+
+def run_graph_cells(task):
+    '''
+    Generate a graph once and run each of its unfinished cells, i.e., each
+    (mu, alpha, method) setting, on it.  Return a list of result rows.
+    '''
+    n, m, seed, cells = task
+    with stage('simulate_graph', n=n, m=m, seed=seed):
+        _, A = simulate_graph(n, m, seed)
+
+    # Fit the mixture model to the scores of every (mu, alpha) setting at once;
+    # each setting is charged an equal share of the time of the fit.
+    groups = [(mu_alpha, list(methods)) for mu_alpha, methods in itertools.groupby(cells, key=lambda cell: cell[:2])]
+    weights = [generate_vertex_weights(A, mu, alpha, seed, seed) for (mu, alpha), _ in groups]
+    start = time.time()
+    estimated_mus, estimated_alphas = em_batch([z_scores for z_scores, _ in weights])
+    fit_time = (time.time()-start)/len(groups)
+
+    settings, positives, trues = list(), list(), list()
+    for ((mu, alpha), methods), (z_scores, implanted), estimated_mu, estimated_alpha in zip(groups, weights, estimated_mus, estimated_alphas):
+        start = time.time()
+        scores = compute_scores(z_scores, estimated_mu, estimated_alpha, worker_score_choice, worker_threshold_choice)
+        score_time = fit_time+time.time()-start
+
+        for _, _, method in methods:
+            start = time.time()
+            positives.append(find_subnetwork(method, z_scores, scores, A, worker_time_limit, seed))
+            trues.append(implanted)
+            settings.append((mu, alpha, method, score_time+time.time()-start))
+
+    # Compare every subnetwork with its implant at once.
+    metrics = compute_metrics(np.array(positives), np.array(trues))
+    return [(n, m, mu, alpha, seed, method, metric.num_positive, metric.recall, metric.precision, metric.f_measure, metric.fdr, runtime)
+        for (mu, alpha, method, runtime), metric in zip(settings, metrics)]
+
+def simulation_sweep(ns, ms, mus, alphas, seeds, methods, output_file, score_choice='responsibilities', threshold_choice='mixing_proportions', time_limit=None, num_cores=1):
+    '''
+    Run a simulation for each cell of the parameter grid over a pool of
+    processes, generating each graph once for all mu, alpha, and method
+    settings.  Results are appended to the output file as each graph finishes,
+    and cells already in the output file are skipped.  Return the number of
+    cells run.
+    '''
+    finished_cells = load_finished_cells(output_file)
+
+    tasks = list()
+    for n, m, seed in itertools.product(ns, ms, seeds):
+        cells = [(mu, alpha, method) for mu, alpha, method in itertools.product(mus, alphas, methods) if cell_key(n, m, mu, alpha, seed, method) not in finished_cells]
+        if cells:
+            tasks.append((n, m, seed, cells))
+
+    if num_cores==1:
+        pool = None
+        initialize_worker(score_choice, threshold_choice, time_limit)
+        results = map(run_graph_cells, tasks)
+    else:
+        pool = multiprocessing.Pool(num_cores, initialize_worker, (score_choice, threshold_choice, time_limit))
+        results = pool.imap_unordered(run_graph_cells, tasks)
+
+    num_cells = 0
+    with open(output_file, 'a') as f:
+        if not f.tell():
+            f.write('\t'.join(parameter_columns+result_columns)+'\n')
+        for rows in results:
+            f.write(''.join('\t'.join(map(str, row))+'\n' for row in rows))
+            f.flush()
+            num_cells += len(rows)
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    return num_cells
+
+# Run script.
+def run(args):
+    start_trace(args.profile)
+
+    simulation_sweep(args.n, args.m, args.mu, args.alpha, args.seeds, args.methods, args.output_file,
+        args.score_choice, args.threshold_choice, args.time_limit, args.num_cores)
+
+if __name__=='__main__':
+    run(get_parser().parse_args(sys.argv[1:]))
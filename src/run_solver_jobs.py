@@ -0,0 +1,193 @@
+#!/usr/bin/python
+
+# Load packages.
+import numpy as np
+import os, sys, argparse, collections, multiprocessing, shutil, signal, subprocess, tempfile, time
+
+from cache import cache_directory, content_key, load_entry, save_entry
+from process_heinz_output import load_heinz_results
+from telemetry import enabled, record, start_trace
+
+# Parse arguments.
+def get_parser():
+    parser = argparse.ArgumentParser(description='Run many heinz or MWCS solver jobs on the cores of this machine.')
+    parser.add_argument('-j', '--jobs_file', type=str, required=True, help='Tab-separated jobs file with an edge list file, a score file, an output file, and, optionally, the number of cores and the time limit of each job')
+    parser.add_argument('-so', '--solver', type=str, choices=['heinz', 'mwcs'], default='mwcs', help='Choose solver')
+    parser.add_argument('-e', '--executable', type=str, required=False, help='heinz executable or any program with the same arguments and output, e.g., a stub for testing')
+    parser.add_argument('-nc', '--num_cores', type=int, required=False, help='Total number of cores; defaults to the number of cores of this machine')
+    parser.add_argument('-ncj', '--num_cores_per_job', type=int, default=1, help='Number of cores for each job without its own number of cores')
+    parser.add_argument('-t', '--time_limit', type=float, required=False, help='Maximum number of seconds for each job without its own time limit')
+    parser.add_argument('-g', '--grace_period', type=float, default=30, help='Number of seconds after the time limit before a job is killed')
+    parser.add_argument('-s', '--seed', type=int, default=0, help='Random seed for the MWCS solver')
+    parser.add_argument('-nrc', '--no_result_cache', action='store_true', help='Run every job instead of reusing cached results')
+    parser.add_argument('-r', '--report_file', type=str, required=False, help='Output file with the status and time of each job; defaults to standard output')
+    parser.add_argument('--profile', type=str, required=False, help='Append telemetry to this JSON-lines trace file')
+    return parser
+
+# Define functions.
+SolverJob = collections.namedtuple('SolverJob', ['edge_list_file', 'score_file', 'output_file', 'num_cores', 'time_limit'])
+JobResult = collections.namedtuple('JobResult', ['job', 'status', 'time', 'returncode'])
+
+def load_jobs(filename, num_cores=1, time_limit=None):
+    '''
+    Load solver jobs from a tab-separated file; jobs without their own number
+    of cores or time limit get num_cores and time_limit.
+    '''
+    jobs = list()
+    with open(filename, 'r') as f:
+        for line in f:
+            arrs = line.rstrip('\n').split('\t')
+            if line.startswith('#') or not line.strip():
+                continue
+            elif len(arrs)<3:
+                raise Exception('{} is not a jobs file; each job needs an edge list file, a score file, and an output file.'.format(filename))
+            job_num_cores = int(arrs[3]) if len(arrs)>3 and arrs[3] else num_cores
+            job_time_limit = float(arrs[4]) if len(arrs)>4 and arrs[4] else time_limit
+            jobs.append(SolverJob(arrs[0], arrs[1], arrs[2], job_num_cores, job_time_limit))
+    return jobs
+
+def solver_command(solver, job, output_file, executable=None, seed=0):
+    '''
+    Return the command that runs a job and writes the solver output to
+    output_file.
+    '''
+    if solver=='heinz':
+        command = [executable, '-e', job.edge_list_file, '-n', job.score_file, '-o', output_file, '-m', str(job.num_cores), '-v', '0']
+        if job.time_limit is not None:
+            command += ['-t', str(int(job.time_limit))]
+    elif solver=='mwcs':
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'compute_mwcs_subset.py')
+        command = [executable or sys.executable, script, '-i', job.score_file, '-elf', job.edge_list_file, '-o', output_file, '-nc', str(job.num_cores), '-s', str(seed)]
+        if job.time_limit is not None:
+            command += ['-t', str(job.time_limit)]
+    else:
+        raise NotImplementedError('{} solver not implemented'.format(solver))
+    return command
+
+def save_solver_output(solver, solver_output_file, output_file):
+    '''
+    Save the nodes of a solver output as a node file, e.g., as
+    process_heinz_output does, and return its contents.
+    '''
+    if solver=='heinz':
+        data = '\n'.join(sorted(load_heinz_results(solver_output_file)))
+    else:
+        with open(solver_output_file, 'r') as f:
+            data = f.read()
+    with open(output_file, 'w') as f:
+        f.write(data)
+    return data
+
+def kill_job(process):
+    '''
+    Kill a job and the processes that it started, e.g., a pool of workers.
+    '''
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        process.kill()
+    process.wait()
+
+def run_solver_jobs(jobs, solver='mwcs', executable=None, num_cores=None, grace_period=30, seed=0, use_cache=True, poll_interval=0.05):
+    '''
+    Run solver jobs as subprocesses, packing them onto num_cores cores: a job
+    starts as soon as its cores are free, taking the jobs in order but letting
+    smaller jobs start ahead of a job that does not fit yet.  A job is killed
+    grace_period seconds after its time limit.  Results are cached by the
+    contents of the edge list and score files and the solver parameters, so
+    that jobs that were already solved are not run again.  Return a JobResult
+    for each job with its status: cached, done, timeout, or failed.
+    '''
+    if solver=='heinz' and executable is None:
+        raise ValueError('heinz requires its executable.')
+    num_cores = num_cores or multiprocessing.cpu_count()
+    directory = cache_directory() if use_cache else ''
+    results = [None]*len(jobs)
+    keys = [None]*len(jobs)
+    digests = dict()
+
+    def finish(i, status, elapsed, returncode=None):
+        results[i] = JobResult(jobs[i], status, elapsed, returncode)
+        if enabled():
+            record('solver_job', solver=solver, edge_list_file=jobs[i].edge_list_file, score_file=jobs[i].score_file,
+                num_cores=jobs[i].num_cores, time_limit=jobs[i].time_limit, status=status, wall_time=elapsed, returncode=returncode)
+
+    # Reuse cached results.
+    queue = list()
+    for i, job in enumerate(jobs):
+        if directory:
+            keys[i] = content_key('solver', [job.edge_list_file, job.score_file], (solver, executable, job.num_cores, job.time_limit, seed), digests)
+            arrays = load_entry(os.path.join(directory, keys[i]))
+            if arrays is not None:
+                with open(job.output_file, 'w') as f:
+                    f.write(arrays['output'].tobytes().decode('utf-8'))
+                finish(i, 'cached', 0.0)
+                continue
+        queue.append(i)
+
+    # Run the other jobs; solver outputs go to a temporary directory until the
+    # jobs finish.
+    temporary_directory = tempfile.mkdtemp(prefix='netmix-jobs-')
+    running = dict()
+    free_cores = num_cores
+    try:
+        with open(os.devnull, 'w') as devnull:
+            while queue or running:
+                for i in list(queue):
+                    job_num_cores = min(jobs[i].num_cores, num_cores)
+                    if job_num_cores<=free_cores:
+                        solver_output_file = os.path.join(temporary_directory, '{}.tsv'.format(i))
+                        command = solver_command(solver, jobs[i], solver_output_file, executable, seed)
+                        process = subprocess.Popen(command, stdout=devnull, stderr=devnull, preexec_fn=os.setsid)
+                        start = time.time()
+                        deadline = start+jobs[i].time_limit+grace_period if jobs[i].time_limit is not None else None
+                        running[i] = (process, start, deadline, job_num_cores, solver_output_file)
+                        free_cores -= job_num_cores
+                        queue.remove(i)
+
+                time.sleep(poll_interval)
+
+                for i, (process, start, deadline, job_num_cores, solver_output_file) in list(running.items()):
+                    returncode = process.poll()
+                    if returncode is None and deadline is not None and time.time()>deadline:
+                        kill_job(process)
+                        finish(i, 'timeout', time.time()-start, process.returncode)
+                    elif returncode is None:
+                        continue
+                    elif returncode!=0 or not os.path.isfile(solver_output_file):
+                        finish(i, 'failed', time.time()-start, returncode)
+                    else:
+                        data = save_solver_output(solver, solver_output_file, jobs[i].output_file)
+                        finish(i, 'done', time.time()-start, returncode)
+                        if directory:
+                            save_entry(directory, keys[i], {'output': np.frombuffer(data.encode('utf-8'), dtype=np.uint8)})
+                    del running[i]
+                    free_cores += job_num_cores
+    finally:
+        for process, _, _, _, _ in running.values():
+            kill_job(process)
+        shutil.rmtree(temporary_directory, ignore_errors=True)
+
+    return results
+
+# Run script.
+def run(args):
+    start_trace(args.profile)
+
+    jobs = load_jobs(args.jobs_file, args.num_cores_per_job, args.time_limit)
+    results = run_solver_jobs(jobs, args.solver, args.executable, args.num_cores, args.grace_period, args.seed, not args.no_result_cache)
+
+    header = ['edge_list_file', 'score_file', 'output_file', 'status', 'time', 'returncode']
+    rows = [[result.job.edge_list_file, result.job.score_file, result.job.output_file, result.status, '{:.3f}'.format(result.time), str(result.returncode)] for result in results]
+    output_string = '\n'.join('\t'.join(row) for row in [header]+rows)
+    if args.report_file is None:
+        print(output_string)
+    else:
+        with open(args.report_file, 'w') as f:
+            f.write(output_string)
+
+    if any(result.status in ['failed', 'timeout'] for result in results):
+        sys.exit(1)
+
+if __name__=='__main__':
+    run(get_parser().parse_args(sys.argv[1:]))
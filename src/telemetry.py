@@ -0,0 +1,91 @@
+#!/usr/bin/python
+
+import os, sys, contextlib, json, time
+
+################################################################################
+#
+# Telemetry functions
+#
+################################################################################
+
+# Telemetry is appended as JSON lines to the trace file given by the
+# NETMIX_PROFILE environment variable or by the --profile argument of a script,
+# which sets NETMIX_PROFILE for child processes too.  Telemetry is disabled if
+# no trace file is given, and then each function returns immediately.
+
+def trace_file():
+    return os.environ.get('NETMIX_PROFILE', '')
+
+def enabled():
+    return bool(os.environ.get('NETMIX_PROFILE'))
+
+def start_trace(filename=None):
+    '''
+    Start tracing to filename, if given, and record the command line.
+    '''
+    if filename:
+        os.environ['NETMIX_PROFILE'] = os.path.abspath(filename)
+    record('start', argv=sys.argv)
+
+def to_json(x):
+    # numpy is not imported here, so that scripts without numpy start quickly;
+    # if it has not been imported elsewhere, then x is not a numpy object.
+    np = sys.modules.get('numpy')
+    if np is not None and isinstance(x, np.ndarray):
+        return x.tolist()
+    elif np is not None and isinstance(x, np.generic):
+        return x.item()
+    else:
+        return str(x)
+
+def record(event, **fields):
+    '''
+    Append an event with the given fields to the trace file.
+    '''
+    filename = trace_file()
+    if not filename:
+        return
+
+    entry = {'event': event, 'time': time.time(), 'pid': os.getpid()}
+    entry.update(fields)
+    with open(filename, 'a') as f:
+        f.write(json.dumps(entry, default=to_json)+'\n')
+
+def memory_usage():
+    '''
+    Return the resident and peak resident memory of this process in bytes.
+    '''
+    import resource
+
+    try:
+        with open('/proc/self/statm') as f:
+            resident_memory = int(f.read().split()[1])*os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError):
+        resident_memory = None
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_memory *= 1 if sys.platform=='darwin' else 1024
+
+    return resident_memory, peak_memory
+
+@contextlib.contextmanager
+def stage(name, **fields):
+    '''
+    Record the wall time and memory of a stage.  The stage yields a dictionary
+    of fields, to which the stage can add, e.g., counts, if telemetry is
+    enabled.
+    '''
+    if not enabled():
+        yield fields
+        return
+
+    start_resident_memory, _ = memory_usage()
+    start = time.time()
+    try:
+        yield fields
+    finally:
+        wall_time = time.time()-start
+        resident_memory, peak_memory = memory_usage()
+        memory_change = resident_memory-start_resident_memory if resident_memory is not None and start_resident_memory is not None else None
+        record('stage', stage=name, wall_time=wall_time, resident_memory=resident_memory, resident_memory_change=memory_change, peak_memory=peak_memory, **fields)